@@ -3,7 +3,7 @@ from fastapi.security import OAuth2PasswordRequestForm
 from schemas.schemas import Token, UserCreate, UserOut, UserUpdate, ForgotPasswordRequest, ResetPasswordRequest
 from manager.auth_manager import create_user, get_user_by_email, update_user_profile, update_user_password
 from services.security import get_current_user,create_access_token,create_refresh_token
-from utils.password_utils import verify_password, hash_password
+from utils.password_utils import verify_and_rehash_async, hash_password_async
 from datetime import datetime
 
 
@@ -31,8 +31,16 @@ async def register(user: UserCreate):
 @router.post("/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     user = await get_user_by_email(form_data.username)
-    if not user or not verify_password(form_data.password, user.get("hashed_password", "")):
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+
+    is_valid, new_hash = await verify_and_rehash_async(form_data.password, user.get("hashed_password", ""))
+    if not is_valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
+
+    # Stored hash was made with an older cost factor; upgrade it while we have the plaintext
+    if new_hash:
+        await update_user_password(user["email"], new_hash)
     return Token(
         access_token=create_access_token(user_id=user["id"], email=user["email"]),
         refresh_token=create_refresh_token(user_id=user["id"], email=user["email"]),
@@ -76,7 +84,6 @@ from manager.auth_manager import (
 from utils.password_utils import (
     generate_reset_token,
     hash_reset_token,
-    hash_password
 )
 
 @router.post("/forgot-password")
@@ -121,7 +128,7 @@ async def reset_password(payload: ResetPasswordRequest):
         raise HTTPException(status_code=400, detail="Token expired")
 
     # 🔐 update password
-    hashed_pwd = hash_password(payload.new_password)
+    hashed_pwd = await hash_password_async(payload.new_password)
     await update_user_password(data["email"], hashed_pwd)
 
     # ✅ mark token as used
@@ -1,136 +1,70 @@
-import os
 import asyncio
 from uuid import uuid4
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Path
-from elasticsearch import AsyncElasticsearch
+from fastapi import APIRouter, Depends, HTTPException, Path
 
 # Assuming these are your actual import paths
 from services.security import get_current_user
-from schemas.schemas import ChallengeCreate, ChallengeOut
-from services.dify_agents import (
-    trigger_agent_1,
-    trigger_agent_2_breakdown,
-    trigger_agent_3_testcases,
-)
-from utils.es_utils import save_challenge, get_challenges_by_group
-from services.sns_notify import notify_member_of_new_repo
-from services.github_service import create_challenge_repository_and_invite
-from manager.group_manager_es import get_group_members_es
-from manager.auth_manager import get_user_by_id
+from schemas.schemas import ChallengeCreate, ChallengeOut, ChallengeJobOut
+from services.challenge_jobs import enqueue_challenge
+from manager.challenge_job_manager import get_challenge_job
+from utils.es_utils import get_challenges_by_group
 
-# --- Configuration ---
-CHALLENGE_INDEX = "challenges"
-BREAKDOWN_INDEX = "breakdowns"
-TESTCASE_INDEX = "testcases"
-ELASTICSEARCH_URL = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
-
-es = AsyncElasticsearch(ELASTICSEARCH_URL)
 router = APIRouter(prefix="/challenges", tags=["Challenges"])
 
-# --- Background Task ---
-async def setup_challenge_repos_for_group(
-    challenge_id: str,
-    group_id: str,
-    challenge_topic: str
-):
-    """
-    Creates a unique, private GitHub repo for each member of a group.
-    """
-    print(f"🚀 Starting background task: Create repos for challenge {challenge_id}")
-    
-    member_ids = await get_group_members_es(group_id)
-    if not member_ids:
-        print(f"[WARN] No members found for group {group_id}.")
-        return
-
-    for user_id in member_ids:
-        user = await get_user_by_id(user_id)
-        if not user:
-            print(f"[WARN] User {user_id} not found. Skipping.")
-            continue
-
-        email = user.get("email")
-        github_username = user.get("github_username")
-
-        if not email or not github_username:
-            print(f"[WARN] User {user_id} missing email or GitHub username. Skipping.")
-            continue
-
-        print(f"Creating repo for challenge '{challenge_id}' for user '{github_username}'...")
-
-        # Correctly call the service with structured IDs
-        repo_details = create_challenge_repository_and_invite(
-            challenge_id=challenge_id,
-            user_id=user_id,
-            collaborator_username=github_username
-        )
-
-        if not repo_details:
-            print(f"❌ Repo creation failed for user {user_id}.")
-            continue
 
-        # Notify the user with details returned from the service
-        notify_member_of_new_repo(
-            email=email,
-            challenge_title=challenge_topic,
-            repo_name=repo_details["repo_name"],
-            clone_url=repo_details["clone_url"]
+def _job_out(job: dict) -> ChallengeJobOut:
+    challenge = None
+    if job["status"] == "completed":
+        challenge = ChallengeOut(
+            **job["challenge"],
+            problem_statement=job.get("outputs", {}).get("problem_statement"),
         )
-        await asyncio.sleep(2) # Avoid hitting API rate limits
-
-    print(f"✅ Repo setup completed for challenge {challenge_id}")
+    return ChallengeJobOut(
+        id=job["id"],
+        challenge_id=job["challenge_id"],
+        status=job["status"],
+        stages=job.get("stages", {}),
+        error=job.get("error"),
+        challenge=challenge,
+    )
 
 
-@router.post("/", response_model=ChallengeOut, status_code=202)
+@router.post("/", response_model=ChallengeJobOut, status_code=202)
 async def create_challenge(
     challenge: ChallengeCreate,
-    background_tasks: BackgroundTasks,
     current_user=Depends(get_current_user)
 ):
     """
-    Creates a challenge, generates content via agents, and schedules repo creation.
+    Queues challenge generation and returns the job right away.
+    Poll GET /challenges/jobs/{job_id} for per-stage progress.
     """
     challenge_id = str(uuid4())
     doc = challenge.dict()
     doc["id"] = challenge_id
     doc["created_by"] = current_user["id"]
 
-    # This part can take a long time. For a real application, consider a
-    # proper job queue (like Celery) instead of awaiting here.
     try:
-        print(f"[{challenge_id}] Triggering agents for topic: {challenge.Topic}")
-        problem_statement = await trigger_agent_1(Topic=challenge.Topic, difficulty=challenge.difficulty, user_id=current_user["id"])
-        doc["problem_statement"] = problem_statement.get("data", {}).get("outputs", {}).get("answer", "").strip()
-        if not doc["problem_statement"]:
-            raise ValueError("Agent 1 (Problem Statement) returned empty.")
+        job = await enqueue_challenge(doc)
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Challenge generation queue is full, try again later.")
 
-        breakdown_result = await trigger_agent_2_breakdown(statement=doc["problem_statement"], user_id=current_user["id"])
-        breakdown_text = breakdown_result.get("data", {}).get("outputs", {}).get("answer", {}).get("api", "")
-        
-        test_result = await trigger_agent_3_testcases(prompt=doc["problem_statement"], user_id=current_user["id"])
-        test_cases_text = test_result.get("data", {}).get("outputs", {}).get("answer", {}).get("raw_text_from_previous_step", "")
+    print(f"[{challenge_id}] ✅ Generation job {job['id']} queued.")
+    return _job_out(job)
 
-        # Save all generated content
-        await save_challenge(doc)
-        await es.index(index=BREAKDOWN_INDEX, id=challenge_id, document={"challenge_id": challenge_id, "breakdown": breakdown_text})
-        await es.index(index=TESTCASE_INDEX, id=challenge_id, document={"challenge_id": challenge_id, "testcases": test_cases_text})
-        print(f"[{challenge_id}] ✅ Agent generation complete.")
 
-    except Exception as e:
-        print(f"❌ Exception during agent orchestration: {e}")
-        raise HTTPException(status_code=503, detail=f"Agent failure: {e}")
-
-    # Schedule the GitHub repo creation to run in the background
-    background_tasks.add_task(
-        setup_challenge_repos_for_group,
-        challenge_id=challenge_id,
-        group_id=challenge.group_id,
-        challenge_topic=challenge.Topic,
-    )
-
-    print(f"[{challenge_id}] ✅ Background task for repo setup scheduled.")
-    return ChallengeOut(**doc)
+@router.get("/jobs/{job_id}", response_model=ChallengeJobOut)
+async def get_challenge_job_status(
+    job_id: str = Path(..., title="Job ID"),
+    current_user=Depends(get_current_user)
+):
+    """
+    Reports the status of a challenge-generation job, stage by stage.
+    """
+    job = await get_challenge_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Challenge job not found")
+    return _job_out(job)
 
 
 @router.get("/group/{group_id}", response_model=List[ChallengeOut])
@@ -1,15 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
 from fastapi import BackgroundTasks
-from schemas.schemas import GroupCreate, GroupOut
+from schemas.schemas import GroupCreate, GroupOut, GroupPage, GroupSummary, GroupMembersPage, GroupDashboard
 from services.sns_notify import notify_user_joined_group
 from services.security import get_current_user
+from manager.dashboard_manager import get_group_dashboard_es
 from manager.group_manager_es import (
     create_group_es,
     list_groups_es,
+    list_my_groups_es,
     get_group_es,
     join_group_es,
-    get_group_members_es
+    leave_group_es,
+    count_group_members_es,
+    get_group_members_page_es
 )
 
 router = APIRouter(prefix="/groups", tags=["Groups"])
@@ -23,18 +27,41 @@ async def create_group(
     # Solution: only pass **group_data, don't use both id=... and **group_data
     return GroupOut(**group_data)
 
-@router.get("/", response_model=List[GroupOut])
-async def list_groups():
-    groups = await list_groups_es()
-    return [GroupOut(**g) for g in groups]
+@router.get("/", response_model=GroupPage)
+async def list_groups(
+    size: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    exclude_mine: bool = False,
+    current_user=Depends(get_current_user)
+):
+    try:
+        groups, next_cursor = await list_groups_es(
+            size=size, cursor=cursor, user_id=current_user["id"], exclude_mine=exclude_mine
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return GroupPage(groups=groups, next_cursor=next_cursor)
+
+@router.get("/mine", response_model=List[GroupSummary])
+async def list_my_groups(current_user=Depends(get_current_user)):
+    return await list_my_groups_es(current_user["id"])
 
 @router.get("/{group_id}", response_model=GroupOut)
 async def get_group(group_id: str):
     group_data = await get_group_es(group_id)
     if not group_data:
         raise HTTPException(status_code=404, detail="Group not found")
+    group_data["member_count"] = await count_group_members_es(group_id)
     return GroupOut(**group_data)
 
+@router.get("/{group_id}/dashboard", response_model=GroupDashboard)
+async def get_group_dashboard(group_id: str, current_user=Depends(get_current_user)):
+    """
+    The group, its leaderboard, recent challenges and the caller's
+    submissions to them, fetched with a single Elasticsearch _msearch.
+    """
+    return await get_group_dashboard_es(group_id, current_user["id"])
+
 @router.post("/{group_id}/join")
 async def join_group(
     group_id: str,
@@ -42,6 +69,9 @@ async def join_group(
     current_user=Depends(get_current_user)
 ):
     group_data = await join_group_es(group_id, current_user["id"])
+    if not group_data["joined"]:
+        return group_data  # Already a member: nothing to notify
+
     user_email = current_user.get("email")
     group_name = group_data.get("name", "Unnamed Group")
 
@@ -52,7 +82,21 @@ async def join_group(
 
     return group_data
 
-@router.get("/{group_id}/members")
-async def get_group_members(group_id: str):
-    members = await get_group_members_es(group_id)
-    return {"group_id": group_id, "members": members}
+@router.post("/{group_id}/leave")
+async def leave_group(
+    group_id: str,
+    current_user=Depends(get_current_user)
+):
+    return await leave_group_es(group_id, current_user["id"])
+
+@router.get("/{group_id}/members", response_model=GroupMembersPage)
+async def get_group_members(
+    group_id: str,
+    size: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None
+):
+    try:
+        members, next_cursor = await get_group_members_page_es(group_id, size=size, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return GroupMembersPage(group_id=group_id, members=members, next_cursor=next_cursor)
@@ -1,22 +1,71 @@
-from fastapi import APIRouter, Depends
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Response
+from typing import List, Optional
 from services.security import get_current_user
-from schemas.schemas import LeaderboardEntry, GroupLeaderboardEntry
+from schemas.schemas import LeaderboardPage, GroupLeaderboardPage, RankedLeaderboardEntry
 from manager.leaderboard import (
-    get_global_leaderboard_es,
-    get_group_leaderboard_es,
+    get_global_leaderboard_payload,
+    get_group_leaderboard_payload,
+    get_my_group_rank,
+    get_group_neighbours,
 )
 
 router = APIRouter(prefix="/leaderboard", tags=["Leaderboard"])
 
 
+def _cached_response(payload: dict, if_none_match: str | None) -> Response:
+    """Serves a pre-serialised page, or a bodyless 304 when the client's copy is current."""
+    headers = {"ETag": payload["etag"], "Cache-Control": "private, no-cache"}
+    if if_none_match and payload["etag"] in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload["body"], media_type="application/json", headers=headers)
+
+
 # ---------------- Global Leaderboard ----------------
-@router.get("/global", response_model=List[LeaderboardEntry])
-async def get_global_leaderboard(current_user=Depends(get_current_user)):
-    return await get_global_leaderboard_es()
+@router.get("/global", response_model=LeaderboardPage)
+async def get_global_leaderboard(
+    size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_user)
+):
+    try:
+        payload = await get_global_leaderboard_payload(size=size, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _cached_response(payload, if_none_match)
 
 
 # ---------------- Group Leaderboard ----------------
-@router.get("/group/{group_id}", response_model=List[GroupLeaderboardEntry])
-async def get_group_leaderboard(group_id: str, current_user=Depends(get_current_user)):
-    return await get_group_leaderboard_es(group_id)
+@router.get("/group/{group_id}", response_model=GroupLeaderboardPage)
+async def get_group_leaderboard(
+    group_id: str,
+    size: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_user)
+):
+    try:
+        payload = await get_group_leaderboard_payload(group_id, size=size, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _cached_response(payload, if_none_match)
+
+
+@router.get("/group/{group_id}/me", response_model=RankedLeaderboardEntry)
+async def get_my_rank(group_id: str, current_user=Depends(get_current_user)):
+    entry = await get_my_group_rank(group_id, current_user["id"])
+    if not entry:
+        raise HTTPException(status_code=404, detail="You are not ranked in this group yet.")
+    return entry
+
+
+@router.get("/group/{group_id}/around-me", response_model=List[RankedLeaderboardEntry])
+async def get_users_around_me(
+    group_id: str,
+    radius: int = Query(5, ge=1, le=50),
+    current_user=Depends(get_current_user)
+):
+    """
+    The current user's row plus `radius` rows above and below it.
+    """
+    return await get_group_neighbours(group_id, current_user["id"], radius)
@@ -0,0 +1,55 @@
+import os
+import hmac
+from fastapi import APIRouter, Depends, Header, HTTPException
+from search.connection import es_pool_stats
+from services.dify_agents import dify_pool_stats
+from services.challenge_jobs import challenge_job_pool
+from services.evaluation_queue import evaluation_pool
+from utils.git_utils import repo_cache
+from manager.evaluation_cache import evaluation_cache_stats
+from manager.auth_manager import user_cache
+from services.security import token_cache
+from utils.rank_engine import rank_engine
+from utils.leaderboard_cache import leaderboard_cache
+from utils.bulk_writer import bulk_writer
+from utils.es_utils import challenge_meta_cache
+from manager.testcase_manager import testcase_cache
+from api.webhooks import webhook_ack_latency
+
+# Scrapers send "Authorization: Bearer <METRICS_TOKEN>"; without a token configured the endpoint is off
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+def require_metrics_token(authorization: str | None = Header(None)):
+    """The stats expose endpoints, node addresses and recent write errors, so they are internal-only."""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"], dependencies=[Depends(require_metrics_token)])
+
+
+@router.get("/")
+async def get_metrics():
+    """
+    Runtime stats for scraping: connection pool utilisation and friends.
+    """
+    return {
+        "elasticsearch": es_pool_stats(),
+        "dify": dify_pool_stats(),
+        "challenge_jobs": challenge_job_pool.stats(),
+        "evaluations": evaluation_pool.stats(),
+        "repo_cache": repo_cache.stats(),
+        "evaluation_cache": evaluation_cache_stats(),
+        "user_cache": user_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "rank_engine": rank_engine.stats(),
+        "leaderboard_cache": leaderboard_cache.stats(),
+        "bulk_writer": bulk_writer.stats(),
+        "challenge_meta_cache": challenge_meta_cache.stats(),
+        "testcase_cache": testcase_cache.stats(),
+        "webhook_ack": webhook_ack_latency.stats(),
+    }
@@ -1,11 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
-from elasticsearch import AsyncElasticsearch
 from services.security import get_current_user
 from schemas.schemas import SubmissionOut
 from utils.es_utils import get_submission_by_id
+from search.connection import get_es
 
 SUBMISSION_INDEX = "submissions"
-es = AsyncElasticsearch("http://localhost:9200")
 router = APIRouter(prefix="/submissions", tags=["Submissions"])
 
 @router.get("/", response_model=list[SubmissionOut])
@@ -24,7 +23,7 @@ async def get_my_submissions(user=Depends(get_current_user)):
         }
     }
     
-    res = await es.search(index=SUBMISSION_INDEX, query=query, size=100)
+    res = await get_es().search(index=SUBMISSION_INDEX, query=query, size=100)
     return [SubmissionOut(**hit["_source"]) for hit in res["hits"]["hits"]]
 
 
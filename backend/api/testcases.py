@@ -1,7 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException
-from manager.testcase_manager import get_testcases_by_challenge
+from fastapi import APIRouter, Depends, HTTPException, Response
+from manager.testcase_manager import get_testcase_entry
 from services.security import get_current_user
-import json
 
 router = APIRouter(prefix="/testcases", tags=["TestCases"])
 
@@ -12,23 +11,12 @@ async def get_testcases(
 ):
     """
     Retrieves the test cases for a given challenge ID.
-    The test cases are stored as a single string, which may be JSON.
+    JSON suites are returned parsed, anything else as raw text. The
+    response body is serialised once and cached with the suite.
     """
-    testcases_str = await get_testcases_by_challenge(challenge_id)
-    
-    if not testcases_str:
+    entry = await get_testcase_entry(challenge_id)
+
+    if not entry or not entry["text"]:
         raise HTTPException(status_code=404, detail="Test cases not found for this challenge.")
 
-    # Try to parse the string as JSON, but fall back to returning the raw string
-    # if it's not valid JSON. This makes the endpoint robust.
-    try:
-        parsed_testcases = json.loads(testcases_str)
-        return {
-            "challenge_id": challenge_id,
-            "testcases": parsed_testcases
-        }
-    except (json.JSONDecodeError, TypeError):
-        return {
-            "challenge_id": challenge_id,
-            "testcases": testcases_str # Return as raw text
-        }
+    return Response(content=entry["body"], media_type="application/json")
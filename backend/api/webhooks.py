@@ -1,20 +1,18 @@
 import os
 import hmac
 import hashlib
-import traceback
+import time
+import asyncio
 import json
 import re
-from uuid import uuid4
 from datetime import datetime, timezone
-from fastapi import APIRouter, Request, Header, HTTPException, BackgroundTasks
-from elasticsearch import AsyncElasticsearch
+from fastapi import APIRouter, Request, Header, HTTPException
 
-from manager.testcase_manager import get_testcases_by_challenge
-from services.dify_agents import trigger_agent_4_evaluation
-from utils.es_utils import update_leaderboard_xp
-from utils.git_utils import get_code_from_repo  # Now synchronous
+from services.evaluation_queue import accept_submission
 from dotenv import load_dotenv
 from manager.auth_manager import get_user_by_id
+from search.connection import get_es
+from utils.latency import LatencyTracker
 
 # ✅ Safe runtime check instead of crashing assertion
 
@@ -22,9 +20,10 @@ load_dotenv()
 
 router = APIRouter(prefix="/webhook", tags=["GitHub Webhook"])
 WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "dummysecret")
-ELASTICSEARCH_URL = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
-es = AsyncElasticsearch(ELASTICSEARCH_URL)
 SUBMISSION_INDEX = "submissions"
+WEBHOOK_ACK_BUDGET_MS = float(os.getenv("WEBHOOK_ACK_BUDGET_MS", "500"))
+
+webhook_ack_latency = LatencyTracker("Webhook ack", budget_ms=WEBHOOK_ACK_BUDGET_MS)
 
 
 def verify_signature(payload_body: bytes, signature: str) -> bool:
@@ -46,72 +45,35 @@ def verify_signature(payload_body: bytes, signature: str) -> bool:
     return hmac.compare_digest(expected_mac, received_sig)
 
 
-async def process_submission(submission_doc: dict, testcases_str: str):
-    submission_id = submission_doc["id"]
-    print(f"🚀 Starting evaluation for submission: {submission_id}")
-    final_status = {"status": "error", "score": 0.0}
-
-    try:
-        print(f"📥 Cloning repo: {submission_doc['clone_url']} at commit {submission_doc['commit_hash']}")
-        user_code_str = get_code_from_repo(
-            clone_url=submission_doc["clone_url"],
-            commit_hash=submission_doc["commit_hash"]
-        )
-        print(f"✅ Repo cloned")
-
-        print(f"🤖 Triggering Agent 4 evaluation...")
-        result = await trigger_agent_4_evaluation(
-            user_code=user_code_str,
-            test_cases=testcases_str,
-            user_id=submission_doc["user_id"]
-        )
-        print(f"✅ Agent 4 triggered")
-        print("📦 Raw Agent 4 Answer:")
-        print(json.dumps(result.get("data", {}).get("outputs", {}), indent=2))
-
-        outputs = result.get("data", {}).get("outputs", {})
-        score = float(outputs.get("score", 0.0))
-        feedback = outputs.get("feedback", "")
-
-        final_status = {
-            "status": "completed",
-            "score": score,
-            "feedback": feedback
-        }
-
-        print(f"✅ Evaluation complete for {submission_id}. Score: {score}")
-
-        if score > 0:
-            await update_leaderboard_xp(
-                user_id=submission_doc["user_id"],
-                challenge_id=submission_doc["challenge_id"],
-                xp_to_add=submission_doc.get("xp", 0),
-                username=submission_doc.get("username", submission_doc["user_id"]),
-                score=score,
-                feedback=feedback
-            )
-
-    except Exception as e:
-        print(f"❌ Evaluation process failed for {submission_id}: {e}")
-        print(traceback.format_exc())
-
-    update_body = {
-        "doc": {
-            **final_status,
-            "processed_at": datetime.now(timezone.utc)
+async def _has_completed_submissions(challenge_id: str, user_id: str) -> bool:
+    query = {
+        "bool": {
+            "must": [
+                {"term": {"challenge_id": challenge_id}},
+                {"term": {"user_id": user_id}},
+                {"term": {"status": "completed"}}
+            ]
         }
     }
-    await es.update(index=SUBMISSION_INDEX, id=submission_id, body=update_body)
-    print(f"✅ Submission saved to Elasticsearch with status: {final_status['status']}")
+    existing = await get_es().search(index=SUBMISSION_INDEX, query=query, size=0, track_total_hits=3)
+    return existing["hits"]["total"]["value"] > 2
 
 
 @router.post("/")
 @router.post("")
 async def github_webhook(
     request: Request,
-    background_tasks: BackgroundTasks,
     x_hub_signature_256: str = Header(None)
 ):
+    # GitHub gives up after 10s and redelivers, so the acknowledge time is tracked against a budget
+    started_at = time.perf_counter()
+    try:
+        return await _ingest_push(request, x_hub_signature_256)
+    finally:
+        webhook_ack_latency.record(started_at)
+
+
+async def _ingest_push(request: Request, x_hub_signature_256: str | None) -> dict:
     body = await request.body()
     if not verify_signature(body, x_hub_signature_256):
         raise HTTPException(status_code=403, detail="Invalid signature")
@@ -123,6 +85,10 @@ async def github_webhook(
         print("⚠ Ignored non-push event")
         return {"status": "ignored", "reason": "Not a push event."}
 
+    if payload.get("deleted", False):
+        print("⚠ Ignoring branch deletion event")
+        return {"status": "ignored", "reason": "Branch deletion push."}
+
     head_commit = payload.get("head_commit", {})
     changed_files = head_commit.get("modified", []) + head_commit.get("added", [])
     changed_files = [f.lower() for f in changed_files]
@@ -143,7 +109,12 @@ async def github_webhook(
     github_user_id = match.group(2)
     print(f"🧠 Challenge ID: {challenge_id}, GitHub User: {github_user_id}")
 
-    user_doc = await get_user_by_id(github_user_id)
+    # Users are stored under their ID, which is what the repo name carries,
+    # so the duplicate check doesn't have to wait for the user lookup
+    user_doc, already_evaluated = await asyncio.gather(
+        get_user_by_id(github_user_id),
+        _has_completed_submissions(challenge_id, github_user_id),
+    )
     if not user_doc:
         print(f"❌ User not found in system for GitHub username: {github_user_id}")
         raise HTTPException(status_code=404, detail=f"User '{github_user_id}' not found in DOJO system.")
@@ -151,25 +122,13 @@ async def github_webhook(
     actual_user_id_for_db = user_doc.get("id", github_user_id)
     actual_username_for_display = user_doc.get("username", github_user_id)
 
-    if payload.get("deleted", False):
-        print("⚠ Ignoring branch deletion event")
-        return {"status": "ignored", "reason": "Branch deletion push."}
-
-    query = {
-        "bool": {
-            "must": [
-                {"term": {"challenge_id": challenge_id}},
-                {"term": {"user_id": actual_user_id_for_db}},
-                {"term": {"status": "completed"}}
-            ]
-        }
-    }
-    existing = await es.search(index=SUBMISSION_INDEX, query=query, size=2)
-    if existing["hits"]["total"]["value"] > 2:
+    if already_evaluated:
         print(f"⚠ Duplicate submission blocked for user={actual_user_id_for_db}, challenge={challenge_id}")
         return {"status": "ignored", "reason": "Already evaluated."}
 
-    submission_id = str(uuid4())
+    # One submission per commit of this user's challenge repo: redeliveries map to the same document,
+    # while the same commit pushed to another challenge (a fork or shared template) is its own submission
+    submission_id = f"{challenge_id}_{actual_user_id_for_db}_{payload['after']}"
     doc = {
         "id": submission_id,
         "challenge_id": challenge_id,
@@ -184,8 +143,13 @@ async def github_webhook(
         "created_at": datetime.now(timezone.utc)
     }
 
-    testcases_str = await get_testcases_by_challenge(challenge_id)
-    await es.index(index=SUBMISSION_INDEX, id=submission_id, document=doc)
-    background_tasks.add_task(process_submission, doc, testcases_str)
-    print(f"✅ Submission created and evaluation started for {submission_id}")
+    try:
+        if not await accept_submission(doc):
+            print(f"⚠ Commit {doc['commit_hash']} was already submitted")
+            return {"status": "ignored", "reason": "Commit already submitted."}
+    except asyncio.QueueFull:
+        print(f"❌ Evaluation queue full, rejecting submission for {repo_name}")
+        raise HTTPException(status_code=503, detail="Evaluation queue is full, try again later.")
+
+    print(f"✅ Submission accepted and queued for evaluation: {submission_id}")
     return {"status": "submitted", "submission_id": submission_id}
@@ -0,0 +1,79 @@
+"""
+Login throughput benchmark: bcrypt inline on the event loop vs. in the hash pool.
+
+Simulates a burst of concurrent logins (the ES lookup is replaced by a short
+sleep) while a probe coroutine measures how long the event loop is stalled,
+i.e. what every other request would feel during the burst.
+
+Run from backend/:
+    python -m benchmarks.bench_login --logins 64 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, round(pct / 100 * (len(values) - 1)))
+    return values[index]
+
+
+async def _probe(stop: asyncio.Event, lags: list[float], interval: float = 0.005):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def _run(mode: str, logins: int, hashed: str, password: str) -> dict:
+    from utils.password_utils import verify_password, verify_and_rehash_async
+
+    async def login() -> float:
+        start = time.perf_counter()
+        await asyncio.sleep(0.002)  # stands in for the user lookup
+        if mode == "inline":
+            verify_password(password, hashed)
+        else:
+            await verify_and_rehash_async(password, hashed)
+        return time.perf_counter() - start
+
+    stop, lags = asyncio.Event(), []
+    probe = asyncio.create_task(_probe(stop, lags))
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+
+    return {
+        "mode": mode,
+        "logins/s": logins / elapsed,
+        "p50 ms": statistics.median(latencies) * 1000,
+        "p99 ms": _percentile(latencies, 99) * 1000,
+        "loop stall p99 ms": _percentile(lags or [0.0], 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    from utils.password_utils import hash_password, PASSWORD_HASH_WORKERS
+
+    password = "correct horse battery staple"
+    hashed = hash_password(password)
+    print(f"{args.logins} concurrent logins, bcrypt rounds={args.rounds}, hash workers={PASSWORD_HASH_WORKERS}")
+
+    for mode in ("inline", "pool"):
+        result = asyncio.run(_run(mode, args.logins, hashed, password))
+        print("  ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,87 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 import os
 from fastapi.middleware.cors import CORSMiddleware
-from api import auth, submission, groups, testcases, leaderboard, challenges, webhooks
+from api import auth, submission, groups, testcases, leaderboard, challenges, webhooks, metrics
+from search.connection import get_es, close_es
+from services.dify_agents import close_dify_clients
+from services.challenge_jobs import challenge_job_pool, resume_challenge_jobs
+from services.evaluation_queue import evaluation_pool, requeue_pending_submissions
+from utils.es_utils import init_indices, rebuild_rank_engine, refresh_rank_engine, RANK_ENGINE_REFRESH
+from manager.group_manager_es import ensure_membership_index
+from utils.bulk_writer import bulk_writer
+from utils.loader import loader_scope
+from utils.lease import LEASE_SECONDS, renew_leases, release_held_leases
 from dotenv import load_dotenv
 load_dotenv()
 
 
-app = FastAPI(title="DOJO Backend")
+async def _sweep_abandoned_work():
+    """
+    Picks up work whose owner stopped renewing its lease (a crashed worker),
+    every LEASE_SECONDS. The startup sweep only sees what had lapsed by then.
+    """
+    while True:
+        await asyncio.sleep(LEASE_SECONDS)
+        try:
+            await resume_challenge_jobs()
+        except Exception as e:
+            print(f"[WARN] Could not resume challenge jobs: {e}")
+        try:
+            await requeue_pending_submissions()
+        except Exception as e:
+            print(f"[WARN] Could not re-queue pending submissions: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One shared Elasticsearch client for the whole process
+    get_es()
+    await bulk_writer.start()
+
+    try:
+        await init_indices()
+        await ensure_membership_index()
+    except Exception as e:
+        print(f"[WARN] Could not create indices: {e}")
+
+    try:
+        await rebuild_rank_engine()
+    except Exception as e:
+        print(f"[WARN] Could not load rank engine, group leaderboards fall back to Elasticsearch: {e}")
+
+    await challenge_job_pool.start()
+    try:
+        await resume_challenge_jobs()
+    except Exception as e:
+        print(f"[WARN] Could not resume challenge jobs: {e}")
+
+    await evaluation_pool.start()
+    try:
+        await requeue_pending_submissions()
+    except Exception as e:
+        print(f"[WARN] Could not re-queue pending submissions: {e}")
+
+    background = [asyncio.create_task(renew_leases()), asyncio.create_task(_sweep_abandoned_work())]
+    if RANK_ENGINE_REFRESH > 0:
+        background.append(asyncio.create_task(refresh_rank_engine()))
+
+    yield
+
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await evaluation_pool.stop()
+    await challenge_job_pool.stop()
+    await close_dify_clients()
+    await bulk_writer.stop()
+    await release_held_leases()
+    await close_es()
+
+
+app = FastAPI(title="DOJO Backend", lifespan=lifespan)
 
 
 # Call this function right at the top, before anything else.
@@ -29,6 +103,12 @@ app.add_middleware(
     allow_headers=["*"], # Allow all headers
 )
 
+@app.middleware("http")
+async def request_loader_scope(request: Request, call_next):
+    # Point lookups made while serving one request are batched and memoised together
+    with loader_scope():
+        return await call_next(request)
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     import traceback
@@ -46,6 +126,7 @@ app.include_router(testcases.router)
 app.include_router(leaderboard.router)
 app.include_router(challenges.router)
 app.include_router(webhooks.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
@@ -1,20 +1,28 @@
-from elasticsearch import AsyncElasticsearch
+import os
+from elasticsearch import NotFoundError
 from uuid import uuid4
 from schemas.schemas import UserCreate, UserUpdate
-from utils.password_utils import hash_password
+from utils.password_utils import hash_password_async
 from datetime import datetime
 from datetime import datetime, timedelta
-from utils.es_utils import es
+from search.connection import get_es
+from utils.cache import TTLCache
+from utils.loader import load_doc, forget_doc
 
 
 
 USER_INDEX = "users"
 
+# email -> user document, for the per-request auth lookup
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
 
 # --- Create User ---
 async def create_user(user: UserCreate) -> dict:
     user_id = str(uuid4())
-    hashed_pw = hash_password(user.password)
+    hashed_pw = await hash_password_async(user.password)
     doc = {
         "id": user_id,
         "username": user.username,
@@ -23,7 +31,7 @@ async def create_user(user: UserCreate) -> dict:
         "github_username": None,
         "created_at": datetime.utcnow().isoformat(),
     }
-    await es.index(index=USER_INDEX, id=user_id, document=doc)
+    await get_es().index(index=USER_INDEX, id=user_id, document=doc)
     return {"id": user_id, "username": user.username, "email": user.email}
 
 
@@ -31,19 +39,41 @@ async def create_user(user: UserCreate) -> dict:
 async def get_user_by_email(email: str) -> dict | None:
     email = email.strip().lower()
 
-    response = await es.search(index=USER_INDEX, query={"term": {"email": email}})
+    response = await get_es().search(index=USER_INDEX, query={"term": {"email": email}})
 
     hits = response["hits"]["hits"]
     return hits[0]["_source"] if hits else None
 
 
+# --- Get User by Email (cached) ---
+async def get_cached_user_by_email(email: str) -> dict | None:
+    """
+    Same as get_user_by_email, but served from an in-process TTL cache.
+    Used on every authenticated request; writes to a user must call
+    invalidate_cached_user so nobody keeps a stale document.
+    Returns a copy, so callers can't change the cached one.
+    """
+    email = email.strip().lower()
+    user = user_cache.get(email)
+    if user is None:
+        user = await get_user_by_email(email)
+        if user:
+            user_cache.set(email, user)
+    return dict(user) if user else None
+
+
+def invalidate_cached_user(email: str | None = None, user_id: str | None = None):
+    if email:
+        user_cache.pop(email.strip().lower())
+    if user_id:
+        user_cache.pop_where(lambda user: user.get("id") == user_id)
+        forget_doc(USER_INDEX, user_id)
+
+
 # --- Get User by ID ---
 async def get_user_by_id(user_id: str) -> dict | None:
-    try:
-        response = await es.get(index=USER_INDEX, id=user_id)
-        return response["_source"]
-    except NotFoundError:
-        return None
+    # Batched with other lookups in the same tick and memoised per request
+    return await load_doc(USER_INDEX, user_id)
 
 
 # --- Update User Profile ---
@@ -54,7 +84,8 @@ async def update_user_profile(user_id: str, user_update: UserUpdate) -> dict | N
         "params": {"github_username": user_update.github_username},
     }
     try:
-        await es.update(index=USER_INDEX, id=user_id, script=script)
+        await get_es().update(index=USER_INDEX, id=user_id, script=script)
+        invalidate_cached_user(user_id=user_id)
         updated_user = await get_user_by_id(user_id)
         return updated_user
     except NotFoundError:
@@ -68,7 +99,8 @@ async def delete_user_by_id(user_id: str) -> bool:
     Returns True if deletion is successful, False if user not found.
     """
     try:
-        await es.delete(index=USER_INDEX, id=user_id)
+        await get_es().delete(index=USER_INDEX, id=user_id)
+        invalidate_cached_user(user_id=user_id)
         return True
     except NotFoundError:
         return False
@@ -80,7 +112,7 @@ async def get_user_by_github_username(github_username: str) -> dict | None:
     This is critical for the webhook to link a GitHub push to a Dojo user.
     """
     query = {"query": {"term": {"github_username.keyword": github_username}}}
-    response = await es.search(index=USER_INDEX, body=query)
+    response = await get_es().search(index=USER_INDEX, body=query)
     hits = response["hits"]["hits"]
     return hits[0]["_source"] if hits else None
 
@@ -89,7 +121,7 @@ PASSWORD_RESET_INDEX = "password_resets"
 
 
 async def create_password_reset(email: str, token_hash: str):
-    await es.index(
+    await get_es().index(
         index=PASSWORD_RESET_INDEX,
         document={
             "email": email,
@@ -101,10 +133,10 @@ async def create_password_reset(email: str, token_hash: str):
 
 
 async def get_password_reset(token_hash):
-    if not await es.indices.exists(index="password_resets"):
+    if not await get_es().indices.exists(index="password_resets"):
         return None
 
-    res = await es.search(
+    res = await get_es().search(
         index="password_resets", body={"query": {"term": {"token_hash": token_hash}}}
     )
 
@@ -113,7 +145,7 @@ async def get_password_reset(token_hash):
 
 
 async def mark_token_used(doc_id: str):
-    await es.update(index=PASSWORD_RESET_INDEX, id=doc_id, doc={"used": True})
+    await get_es().update(index=PASSWORD_RESET_INDEX, id=doc_id, doc={"used": True})
 
 
 async def update_user_password(email: str, hashed_password: str):
@@ -121,17 +153,18 @@ async def update_user_password(email: str, hashed_password: str):
     print("🔍 EMAIL TYPE:", type(email))
     print("🔍 EMAIL LENGTH:", len(email))
 
-    res = await es.search(index="users", query={"term": {"email": email}})
+    res = await get_es().search(index="users", query={"term": {"email": email}})
 
     if not res["hits"]["hits"]:
         raise Exception("User not found")
 
     user_id = res["hits"]["hits"][0]["_id"]
 
-    await es.update(
+    await get_es().update(
         index="users",
         id=user_id,
         doc={"hashed_password": hashed_password},  # 🔑 THIS FIELD NAME MATTERS
     )
+    invalidate_cached_user(email=email, user_id=user_id)
 
     return True
@@ -0,0 +1,70 @@
+from uuid import uuid4
+from datetime import datetime, timezone
+from elasticsearch import NotFoundError
+from search.connection import get_es
+from utils.lease import lease_fields, hold, expired_lease_query
+
+CHALLENGE_JOB_INDEX = "challenge_jobs"
+
+# Generation stages, in the order the pipeline runs them
+JOB_STAGES = ["problem_statement", "breakdown", "testcases", "save"]
+# Statuses a worker can claim a job in, see utils/lease.py
+UNFINISHED_JOB_STATUSES = ["queued", "running"]
+
+
+async def create_challenge_job(challenge: dict) -> dict:
+    """
+    Persists a new queued job for the given challenge document, leased to
+    this worker so no other worker's sweep picks it up.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    job = {
+        "id": str(uuid4()),
+        "challenge_id": challenge["id"],
+        "created_by": challenge["created_by"],
+        "status": "queued",
+        "stages": {stage: "pending" for stage in JOB_STAGES},
+        "challenge": challenge,
+        "outputs": {},
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        **lease_fields(),
+    }
+    await get_es().index(index=CHALLENGE_JOB_INDEX, id=job["id"], document=job)
+    hold(CHALLENGE_JOB_INDEX, job["id"])
+    return job
+
+
+async def get_challenge_job(job_id: str) -> dict | None:
+    try:
+        res = await get_es().get(index=CHALLENGE_JOB_INDEX, id=job_id)
+        return res["_source"]
+    except NotFoundError:
+        return None
+
+
+async def update_challenge_job(job_id: str, fields: dict):
+    """
+    Partially updates a job. Nested objects like 'stages' and 'outputs'
+    are merged, so only the changed keys need to be passed.
+    """
+    fields = {**fields, "updated_at": datetime.now(timezone.utc).isoformat()}
+    await get_es().update(index=CHALLENGE_JOB_INDEX, id=job_id, doc=fields)
+
+
+async def get_unfinished_challenge_jobs(size: int = 1000) -> list[dict]:
+    """
+    Returns jobs that were queued or mid-flight and whose lease has lapsed,
+    oldest first.
+    """
+    if not await get_es().indices.exists(index=CHALLENGE_JOB_INDEX):
+        return []
+
+    res = await get_es().search(
+        index=CHALLENGE_JOB_INDEX,
+        query={"bool": {"filter": [{"terms": {"status": UNFINISHED_JOB_STATUSES}}, expired_lease_query()]}},
+        sort=[{"created_at": {"order": "asc", "unmapped_type": "date"}}],
+        size=size,
+    )
+    return [{**hit["_source"], "id": hit["_id"]} for hit in res["hits"]["hits"]]
@@ -0,0 +1,86 @@
+from fastapi import HTTPException
+from search.connection import get_es
+from manager.group_manager_es import GROUP_INDEX, MEMBERSHIP_INDEX
+from manager.leaderboard import get_group_leaderboard_es, GROUP_LEADERBOARD_SIZE
+from utils.es_utils import CHALLENGE_INDEX, SUBMISSION_INDEX, LEADERBOARD_INDEX, LEADERBOARD_SORT
+from utils.rank_engine import rank_engine
+
+DASHBOARD_CHALLENGES = 5
+DASHBOARD_SUBMISSIONS = 100
+
+
+def _hits(response: dict, section: str) -> list[dict]:
+    # One failed search (e.g. an index that doesn't exist yet) shouldn't sink the whole dashboard
+    if "error" in response:
+        print(f"[WARN] Dashboard {section} search failed: {response['error']}")
+        return []
+    return response["hits"]["hits"]
+
+
+async def get_group_dashboard_es(group_id: str, user_id: str) -> dict:
+    """
+    Everything the group page shows, from one _msearch: the group and its
+    member count, the leaderboard, recent challenges and the user's
+    submissions to them. The leaderboard comes from the rank engine
+    instead when it is loaded.
+    """
+    searches = [
+        {"index": GROUP_INDEX},
+        {"query": {"ids": {"values": [group_id]}}, "size": 1},
+        {"index": MEMBERSHIP_INDEX},
+        {"query": {"term": {"group_id": group_id}}, "size": 0, "track_total_hits": True},
+        {"index": CHALLENGE_INDEX},
+        {
+            "query": {"term": {"group_id": group_id}},
+            "sort": [{"created_at": {"order": "desc", "unmapped_type": "date"}}],
+            "size": DASHBOARD_CHALLENGES,
+        },
+        # Submissions store the user's ID, the same one the repo name carries
+        {"index": SUBMISSION_INDEX},
+        {
+            "query": {"term": {"user_id": user_id}},
+            "sort": [{"created_at": {"order": "desc", "unmapped_type": "date"}}],
+            "size": DASHBOARD_SUBMISSIONS,
+        },
+    ]
+    if not rank_engine.ready:
+        searches += [
+            {"index": LEADERBOARD_INDEX},
+            {"query": {"term": {"group_id": group_id}}, "sort": LEADERBOARD_SORT, "size": GROUP_LEADERBOARD_SIZE},
+        ]
+
+    res = await get_es().msearch(searches=searches)
+    group_res, members_res, challenges_res, submissions_res, *leaderboard_res = res["responses"]
+
+    group_hits = _hits(group_res, "group")
+    if not group_hits:
+        raise HTTPException(status_code=404, detail="Group not found")
+    group = {**group_hits[0]["_source"], "id": group_hits[0]["_id"]}
+    group["member_count"] = 0 if "error" in members_res else members_res["hits"]["total"]["value"]
+
+    challenges = [hit["_source"] for hit in _hits(challenges_res, "challenges")]
+    challenge_ids = {challenge["id"] for challenge in challenges}
+    submissions = [
+        hit["_source"] for hit in _hits(submissions_res, "submissions")
+        if hit["_source"].get("challenge_id") in challenge_ids
+    ]
+
+    if leaderboard_res:
+        leaderboard = [
+            {
+                "user_id": hit["_source"]["user_id"],
+                "username": hit["_source"].get("username", "Unknown"),
+                "score": hit["_source"].get("score", 0.0),
+                "group_id": group_id,
+            }
+            for hit in _hits(leaderboard_res[0], "leaderboard")
+        ]
+    else:
+        leaderboard = (await get_group_leaderboard_es(group_id)).entries
+
+    return {
+        "group": group,
+        "leaderboard": leaderboard,
+        "challenges": challenges,
+        "submissions": submissions,
+    }
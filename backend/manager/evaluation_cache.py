@@ -0,0 +1,53 @@
+import hashlib
+from datetime import datetime, timezone
+from elasticsearch import NotFoundError
+from search.connection import get_es
+
+EVALUATION_CACHE_INDEX = "evaluation_cache"
+
+_stats = {"hits": 0, "misses": 0}
+
+
+def evaluation_cache_key(user_code: str, testcases: str | None) -> str:
+    """
+    Content address for an evaluation: the collected source and the
+    testcases it was judged against. Commits that don't change either
+    (merges, amends, README edits) map to the same key.
+    """
+    code_hash = hashlib.sha256(user_code.encode()).hexdigest()
+    testcase_hash = hashlib.sha256((testcases or "").encode()).hexdigest()
+    return hashlib.sha256(f"{code_hash}:{testcase_hash}".encode()).hexdigest()
+
+
+async def get_cached_evaluation(cache_key: str) -> dict | None:
+    """
+    Returns the stored {"score", "feedback"} for this key, or None.
+    """
+    try:
+        res = await get_es().get(index=EVALUATION_CACHE_INDEX, id=cache_key)
+        _stats["hits"] += 1
+        source = res["_source"]
+        return {"score": source["score"], "feedback": source.get("feedback", "")}
+    except NotFoundError:
+        _stats["misses"] += 1
+        return None
+
+
+async def save_cached_evaluation(cache_key: str, score: float, feedback: str):
+    await get_es().index(
+        index=EVALUATION_CACHE_INDEX,
+        id=cache_key,
+        document={
+            "score": score,
+            "feedback": feedback,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        },
+    )
+
+
+def evaluation_cache_stats() -> dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / lookups, 3) if lookups else 0.0,
+    }
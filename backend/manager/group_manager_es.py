@@ -1,12 +1,47 @@
 from fastapi import HTTPException
-from elasticsearch import AsyncElasticsearch, NotFoundError
+from elasticsearch import NotFoundError, ConflictError, helpers
 from uuid import uuid4
 from datetime import datetime
 from schemas.schemas import GroupCreate
+from search.connection import get_es
+from utils.cursor import encode_cursor, decode_cursor
+from utils.loader import load_doc
 
-# Use the async client, consistent with the rest of the application
-es = AsyncElasticsearch("http://localhost:9200")
 GROUP_INDEX = "groups"
+# One document per (group_id, user_id), ID "<group_id>_<user_id>"
+MEMBERSHIP_INDEX = "group_members"
+
+# What a group listing carries; members live in MEMBERSHIP_INDEX
+GROUP_LIST_FIELDS = ["id", "name", "description", "created_by", "created_at"]
+# Groups per search in list_my_groups_es, well inside the 10k result window
+MY_GROUPS_BATCH = 1000
+GROUP_LIST_SORT = [
+    {"created_at": {"order": "desc", "unmapped_type": "date"}},
+    # Existing indices map id dynamically (text + keyword subfield); sorting on the text field 500s
+    {"id.keyword": {"order": "asc", "unmapped_type": "keyword"}},
+]
+
+
+def membership_id(group_id: str, user_id: str) -> str:
+    return f"{group_id}_{user_id}"
+
+
+async def ensure_membership_index():
+    """
+    Creates the membership index with its keyword mapping. Runs at startup:
+    if the first join created it dynamically, group_id and user_id would be
+    text and every term query and aggregation on them would miss.
+    """
+    if await get_es().indices.exists(index=MEMBERSHIP_INDEX):
+        return
+    # 400 is another worker having created it first
+    await get_es().options(ignore_status=400).indices.create(index=MEMBERSHIP_INDEX, mappings={"properties": {
+        "group_id": {"type": "keyword"},
+        "user_id": {"type": "keyword"},
+        "joined_at": {"type": "date"},
+    }})
+    print(f"[OK] Created index: {MEMBERSHIP_INDEX}")
+
 
 async def create_group_es(group_data: GroupCreate, user_id: str) -> dict:
     """
@@ -20,64 +55,214 @@ async def create_group_es(group_data: GroupCreate, user_id: str) -> dict:
         "description": group_data.description,
         "created_by": user_id,
         "created_at": datetime.utcnow().isoformat(),
-        "members": [user_id]  # Creator auto-joins
     }
-    await es.index(index=GROUP_INDEX, id=group_id, document=doc)
-    return doc
+    await get_es().index(index=GROUP_INDEX, id=group_id, document=doc)
+    await add_membership_es(group_id, user_id)  # Creator auto-joins
+    return {**doc, "member_count": 1}
 
-async def list_groups_es() -> list[dict]:
+async def _search_group_summaries(query: dict, size: int, search_after: list | None, user_id: str | None) -> tuple[list[dict], list]:
     """
-    Retrieves all groups from Elasticsearch. This version ensures the
-    document ID is included in the returned data.
+    Runs a group search with the listing fields only, then fills in member
+    counts and whether `user_id` is a member from one aggregation.
+    Returns the groups and the sort values of the last hit.
     """
-    response = await es.search(index=GROUP_INDEX, query={"match_all": {}}, size=1000)
-    
+    response = await get_es().search(
+        index=GROUP_INDEX,
+        query=query,
+        source=GROUP_LIST_FIELDS,
+        sort=GROUP_LIST_SORT,
+        search_after=search_after,
+        size=size,
+    )
+
     groups_list = []
     for hit in response["hits"]["hits"]:
         group_data = hit["_source"]
-        # --- FIX: Manually add the document's unique ID to the dictionary ---
-        # The 'id' field in _source might be missing in older documents, 
+        # The 'id' field in _source might be missing in older documents,
         # but '_id' is always present in the hit metadata.
         group_data["id"] = hit["_id"]
         groups_list.append(group_data)
-        
+
+    counts, joined = await get_membership_summary_es([g["id"] for g in groups_list], user_id)
+    for group_data in groups_list:
+        group_data["member_count"] = counts.get(group_data["id"], 0)
+        group_data["is_member"] = group_data["id"] in joined
+
+    hits = response["hits"]["hits"]
+    return groups_list, hits[-1]["sort"] if hits else None
+
+async def list_groups_es(
+    size: int = 50,
+    cursor: str | None = None,
+    user_id: str | None = None,
+    exclude_mine: bool = False
+) -> tuple[list[dict], str | None]:
+    """
+    Retrieves one page of groups, newest first, and the cursor for the next.
+    With `exclude_mine`, groups `user_id` belongs to are filtered out in
+    Elasticsearch. Raises ValueError on a malformed cursor.
+    """
+    search_after = decode_cursor(cursor) if cursor else None
+    query = {"match_all": {}}
+    if exclude_mine and user_id:
+        my_group_ids = await get_user_group_ids_es(user_id)
+        if my_group_ids:
+            query = {"bool": {"must_not": [{"ids": {"values": my_group_ids}}]}}
+
+    groups_list, last_sort = await _search_group_summaries(query, size, search_after, user_id)
+    next_cursor = encode_cursor(last_sort) if len(groups_list) == size else None
+    return groups_list, next_cursor
+
+async def list_my_groups_es(user_id: str) -> list[dict]:
+    """
+    Retrieves every group the user belongs to, newest first, looked up by
+    the user's membership documents rather than by scanning all groups.
+    Searched in batches of MY_GROUPS_BATCH IDs.
+    """
+    my_group_ids = await get_user_group_ids_es(user_id)
+    groups_list = []
+    for start in range(0, len(my_group_ids), MY_GROUPS_BATCH):
+        batch = my_group_ids[start:start + MY_GROUPS_BATCH]
+        groups, _ = await _search_group_summaries({"ids": {"values": batch}}, len(batch), None, user_id)
+        groups_list.extend(groups)
+    # Same order as GROUP_LIST_SORT across batches
+    groups_list.sort(key=lambda g: g["id"])
+    groups_list.sort(key=lambda g: g.get("created_at") or "", reverse=True)
     return groups_list
 
 async def get_group_es(group_id: str) -> dict | None:
     """
     Retrieves a single group by its ID.
     """
-    try:
-        response = await es.get(index=GROUP_INDEX, id=group_id)
-        group_data = response["_source"]
-        group_data["id"] = response["_id"] # Also add the ID here for consistency
-        return group_data
-    except NotFoundError:
+    group_data = await load_doc(GROUP_INDEX, group_id)
+    if group_data is None:
         return None
+    group_data["id"] = group_id # Also add the ID here for consistency
+    return group_data
 
-async def join_group_es(group_id: str, user_id: str) -> dict:
+async def _require_group(group_id: str):
+    # A HEAD request; the group document itself isn't needed
+    if not await get_es().exists(index=GROUP_INDEX, id=group_id):
+        raise HTTPException(status_code=404, detail="Group not found")
+
+
+# --- Membership ---
+async def add_membership_es(group_id: str, user_id: str) -> bool:
     """
-    Adds a user to a group's member list.
+    Writes the (group, user) membership document. Returns False if the
+    user was already a member; the create op makes repeats a no-op.
     """
     try:
-        script = {
-            "source": "if (!ctx._source.members.contains(params.user_id)) { ctx._source.members.add(params.user_id) }",
-            "lang": "painless",
-            "params": {"user_id": user_id}
-        }
-        await es.update(index=GROUP_INDEX, id=group_id, script=script)
-        return {"message": "Successfully joined group"}
-    except NotFoundError:
+        await get_es().create(
+            index=MEMBERSHIP_INDEX,
+            id=membership_id(group_id, user_id),
+            document={
+                "group_id": group_id,
+                "user_id": user_id,
+                "joined_at": datetime.utcnow().isoformat(),
+            },
+        )
+        return True
+    except ConflictError:
+        return False
+
+async def join_group_es(group_id: str, user_id: str) -> dict:
+    """
+    Adds a user to a group. Joining twice is a no-op; `joined` says
+    whether this call added the membership.
+    """
+    group = await get_group_es(group_id)
+    if not group:
         raise HTTPException(status_code=404, detail="Group not found")
+    try:
+        joined = await add_membership_es(group_id, user_id)
     except Exception as e:
         print(f"Error joining group: {e}")
         raise HTTPException(status_code=500, detail="Could not join group.")
+    message = "Successfully joined group" if joined else "Already a member of this group"
+    return {"message": message, "name": group.get("name"), "joined": joined}
+
+async def leave_group_es(group_id: str, user_id: str) -> dict:
+    """
+    Removes a user from a group. Leaving a group you're not in is harmless.
+    """
+    await _require_group(group_id)
+    try:
+        await get_es().delete(index=MEMBERSHIP_INDEX, id=membership_id(group_id, user_id))
+        return {"message": "Successfully left group"}
+    except NotFoundError:
+        return {"message": "Not a member of this group"}
+
+async def count_group_members_es(group_id: str) -> int:
+    response = await get_es().count(index=MEMBERSHIP_INDEX, query={"term": {"group_id": group_id}})
+    return response["count"]
+
+async def get_membership_summary_es(group_ids: list[str], user_id: str | None = None) -> tuple[dict, set]:
+    """
+    Member counts for the given groups, and which of them `user_id` is in,
+    from a single size=0 aggregation.
+    """
+    if not group_ids:
+        return {}, set()
+    response = await get_es().search(
+        index=MEMBERSHIP_INDEX,
+        query={"terms": {"group_id": group_ids}},
+        size=0,
+        aggs={
+            "counts": {"terms": {"field": "group_id", "size": len(group_ids)}},
+            "mine": {
+                "filter": {"term": {"user_id": user_id or ""}},
+                "aggs": {"groups": {"terms": {"field": "group_id", "size": len(group_ids)}}},
+            },
+        },
+    )
+    aggs = response["aggregations"]
+    counts = {bucket["key"]: bucket["doc_count"] for bucket in aggs["counts"]["buckets"]}
+    joined = {bucket["key"] for bucket in aggs["mine"]["groups"]["buckets"]}
+    return counts, joined
 
 async def get_group_members_es(group_id: str) -> list[str]:
     """
     Retrieves the list of member IDs for a group.
     """
-    group = await get_group_es(group_id)
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-    return group.get("members", [])
\ No newline at end of file
+    await _require_group(group_id)
+    return [
+        hit["_source"]["user_id"]
+        async for hit in helpers.async_scan(
+            get_es(),
+            index=MEMBERSHIP_INDEX,
+            query={"query": {"term": {"group_id": group_id}}, "_source": ["user_id"]},
+        )
+    ]
+
+async def get_group_members_page_es(group_id: str, size: int = 100, cursor: str | None = None) -> tuple[list[str], str | None]:
+    """
+    Retrieves one page of a group's member IDs, ordered by user ID, and the
+    cursor for the next. Raises ValueError on a malformed cursor.
+    """
+    search_after = decode_cursor(cursor) if cursor else None
+    await _require_group(group_id)
+    response = await get_es().search(
+        index=MEMBERSHIP_INDEX,
+        query={"term": {"group_id": group_id}},
+        source=["user_id"],
+        sort=[{"user_id": {"order": "asc"}}],
+        search_after=search_after,
+        size=size,
+    )
+    hits = response["hits"]["hits"]
+    next_cursor = encode_cursor(hits[-1]["sort"]) if len(hits) == size else None
+    return [hit["_source"]["user_id"] for hit in hits], next_cursor
+
+async def get_user_group_ids_es(user_id: str) -> list[str]:
+    """
+    Retrieves the IDs of every group a user belongs to.
+    """
+    return [
+        hit["_source"]["group_id"]
+        async for hit in helpers.async_scan(
+            get_es(),
+            index=MEMBERSHIP_INDEX,
+            query={"query": {"term": {"user_id": user_id}}, "_source": ["group_id"]},
+        )
+    ]
@@ -1,50 +1,165 @@
 from typing import List
-from collections import defaultdict
-from schemas.schemas import LeaderboardEntry, GroupLeaderboardEntry
-from utils.es_utils import get_leaderboard
+from schemas.schemas import (
+    LeaderboardEntry,
+    GroupLeaderboardEntry,
+    RankedLeaderboardEntry,
+    LeaderboardPage,
+    GroupLeaderboardPage,
+)
+import asyncio
+from utils.es_utils import get_leaderboard, get_global_leaderboard, get_leaderboard_row, count_leaderboard_ahead
+from utils.rank_engine import rank_engine
+from utils.cursor import encode_cursor, decode_cursor
+from utils.leaderboard_cache import GLOBAL_SCOPE, get_cached_payload, cache_payload
 
+GROUP_LEADERBOARD_SIZE = 100
 
-async def get_global_leaderboard_es() -> List[LeaderboardEntry]:
+
+def _next_cursor(entries: list, size: int) -> str | None:
+    """A full page may have more after it; the cursor is the last row's sort values."""
+    if len(entries) < size:
+        return None
+    last = entries[-1]
+    return encode_cursor([last["score"], last["xp"], last["user_id"]])
+
+
+def _after(cursor: str | None) -> list | None:
+    """Decodes a cursor into [score, xp, user_id]. Raises ValueError if it isn't one."""
+    if not cursor:
+        return None
+    values = decode_cursor(cursor)
+    if len(values) != 3:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+async def get_global_leaderboard_es(size: int = 50, cursor: str | None = None) -> LeaderboardPage:
+    """
+    Fetches one page of the global leaderboard from the per-user totals
+    index with search_after, so deep pages cost the same as the first.
+    """
+    rows = await get_global_leaderboard(size=size, search_after=_after(cursor))
+    return LeaderboardPage(
+        entries=[
+            LeaderboardEntry(
+                user_id=row["user_id"],
+                username=row.get("username") or "Unknown",
+                score=row.get("score") or 0.0,
+            )
+            for row in rows
+        ],
+        next_cursor=_next_cursor(rows, size),
+    )
+
+
+async def get_group_leaderboard_es(
+    group_id: str,
+    size: int = GROUP_LEADERBOARD_SIZE,
+    cursor: str | None = None
+) -> GroupLeaderboardPage:
     """
-    Calculates the global leaderboard by aggregating user score across all groups.
+    Fetches one page of the leaderboard for a specific group.
+    Served from the in-memory rank engine once it has been loaded,
+    otherwise from Elasticsearch with search_after.
     """
-    all_entries = await get_leaderboard(group_id=None)
+    after = _after(cursor)
 
-    user_score_aggregator = defaultdict(lambda: {"score": 0.0, "username": "Unknown"})
+    if rank_engine.ready:
+        entries = rank_engine.page(group_id, size, after)
+    else:
+        entries = [
+            {
+                "user_id": entry["user_id"],
+                "username": entry.get("username", "Unknown"),
+                "score": entry.get("score", 0.0),
+                "xp": entry.get("xp", 0),
+            }
+            for entry in await get_leaderboard(group_id=group_id, size=size, search_after=after)
+        ]
 
-    for entry in all_entries:
-        user_id = entry.get("user_id")
-        if user_id:
-            user_score_aggregator[user_id]["score"] += entry.get("score", 0.0)
-            if user_score_aggregator[user_id]["username"] == "Unknown":
-                user_score_aggregator[user_id]["username"] = entry.get("username", "Unknown")
+    return GroupLeaderboardPage(
+        entries=[
+            GroupLeaderboardEntry(
+                user_id=entry["user_id"],
+                username=entry["username"],
+                score=entry["score"],
+                group_id=group_id
+            )
+            for entry in entries
+        ],
+        next_cursor=_next_cursor(entries, size),
+    )
 
-    global_leaderboard = [
-        LeaderboardEntry(
-            user_id=user_id,
-            username=data["username"],
-            score=data["score"]
-        )
-        for user_id, data in user_score_aggregator.items()
-    ]
 
-    return sorted(global_leaderboard, key=lambda x: x.score, reverse=True)
+
+async def get_global_leaderboard_payload(size: int = 50, cursor: str | None = None) -> dict:
+    """
+    The serialised global page with its ETag, from the response cache when
+    no XP has been awarded since it was built.
+    """
+    payload = get_cached_payload(GLOBAL_SCOPE, size, cursor)
+    if payload is None:
+        page = await get_global_leaderboard_es(size=size, cursor=cursor)
+        payload = cache_payload(GLOBAL_SCOPE, size, cursor, page.model_dump_json().encode())
+    return payload
 
 
-async def get_group_leaderboard_es(group_id: str) -> List[GroupLeaderboardEntry]:
+async def get_group_leaderboard_payload(
+    group_id: str,
+    size: int = GROUP_LEADERBOARD_SIZE,
+    cursor: str | None = None
+) -> dict:
     """
-    Fetches the leaderboard for a specific group.
+    The serialised group page with its ETag. Cached per group until
+    update_leaderboard_xp invalidates it.
     """
-    leaderboard = await get_leaderboard(group_id=group_id)
+    payload = get_cached_payload(group_id, size, cursor)
+    if payload is None:
+        page = await get_group_leaderboard_es(group_id, size=size, cursor=cursor)
+        payload = cache_payload(group_id, size, cursor, page.model_dump_json().encode())
+    return payload
+
+def _ranked_entry(row: dict, rank: int) -> RankedLeaderboardEntry:
+    return RankedLeaderboardEntry(
+        user_id=row["user_id"],
+        group_id=row["group_id"],
+        username=row.get("username") or "Unknown",
+        score=row.get("score") or 0.0,
+        xp=row.get("xp") or 0,
+        rank=rank,
+    )
+
+
+async def _rank_of_es(group_id: str, user_id: str) -> tuple[dict, int] | None:
+    row = await get_leaderboard_row(group_id, user_id)
+    if row is None:
+        return None
+    return row, await count_leaderboard_ahead(row) + 1
+
+
+async def get_my_group_rank(group_id: str, user_id: str) -> RankedLeaderboardEntry | None:
+    """From the rank engine, or from Elasticsearch if it isn't loaded."""
+    if rank_engine.ready:
+        entry = rank_engine.rank_of(group_id, user_id)
+        return RankedLeaderboardEntry(**entry) if entry else None
+    ranked = await _rank_of_es(group_id, user_id)
+    return _ranked_entry(*ranked) if ranked else None
+
 
-    group_leaderboard = [
-        GroupLeaderboardEntry(
-            user_id=entry["user_id"],
-            username=entry.get("username", "Unknown"),
-            score=entry.get("score", 0.0),
-            group_id=group_id
-        )
-        for entry in leaderboard
-    ]
+async def get_group_neighbours(group_id: str, user_id: str, radius: int) -> List[RankedLeaderboardEntry]:
+    """From the rank engine, or from Elasticsearch if it isn't loaded."""
+    if rank_engine.ready:
+        return [RankedLeaderboardEntry(**entry) for entry in rank_engine.around(group_id, user_id, radius)]
 
-    return sorted(group_leaderboard, key=lambda x: x.score, reverse=True)
+    ranked = await _rank_of_es(group_id, user_id)
+    if ranked is None:
+        return []
+    row, rank = ranked
+    cursor = [row.get("score") or 0.0, row.get("xp") or 0, user_id]
+    before, after = await asyncio.gather(
+        get_leaderboard(group_id, size=radius, search_after=cursor, reverse=True),
+        get_leaderboard(group_id, size=radius, search_after=cursor),
+    )
+    rows = list(reversed(before)) + [row] + after
+    first_rank = rank - len(before)
+    return [_ranked_entry(entry, first_rank + offset) for offset, entry in enumerate(rows)]
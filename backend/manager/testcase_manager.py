@@ -1,21 +1,53 @@
-from elasticsearch import AsyncElasticsearch, NotFoundError
+import os
+import json
+from elasticsearch import NotFoundError
+from search.connection import get_es
+from utils.cache import TTLCache
+from utils.testcase_format import from_testcase_doc
 
-es = AsyncElasticsearch("http://localhost:9200")
 TESTCASE_INDEX = "testcases"
 
-async def get_testcases_by_challenge(challenge_id: str) -> str | None:
+# Testcases never change once a challenge is saved, so entries only leave by LRU
+TESTCASE_CACHE_SIZE = int(os.getenv("TESTCASE_CACHE_SIZE", "256"))
+testcase_cache = TTLCache(maxsize=TESTCASE_CACHE_SIZE, ttl=float("inf"))
+
+
+def cache_testcases(challenge_id: str, doc: dict) -> dict:
     """
-    Fetches the test cases document for a specific challenge from Elasticsearch.
-    
-    Returns the 'testcases' field as a string, or None if not found.
+    Caches a stored testcase document as its text (what Agent 4 gets),
+    the parsed suite, and the serialised GET /testcases response.
     """
+    text, parsed = from_testcase_doc(doc)
+    entry = {
+        "text": text,
+        "parsed": parsed,
+        "body": json.dumps({"challenge_id": challenge_id, "testcases": parsed}, ensure_ascii=False).encode(),
+    }
+    testcase_cache.set(challenge_id, entry)
+    return entry
+
+
+async def get_testcase_entry(challenge_id: str) -> dict | None:
+    entry = testcase_cache.get(challenge_id)
+    if entry is not None:
+        return entry
     try:
         # The document ID for test cases is the challenge_id
-        res = await es.get(index=TESTCASE_INDEX, id=challenge_id)
-        return res["_source"]["testcases"]
+        res = await get_es().get(index=TESTCASE_INDEX, id=challenge_id)
     except NotFoundError:
         print(f"No test cases found for challenge_id: {challenge_id}")
         return None
     except Exception as e:
         print(f"An error occurred while fetching test cases: {e}")
         return None
+    return cache_testcases(challenge_id, res["_source"])
+
+
+async def get_testcases_by_challenge(challenge_id: str) -> str | None:
+    """
+    Fetches the test cases for a specific challenge, from the cache when possible.
+
+    Returns the normalised test cases as a string, or None if not found.
+    """
+    entry = await get_testcase_entry(challenge_id)
+    return entry["text"] if entry else None
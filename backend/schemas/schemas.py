@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from pydantic import BaseModel, EmailStr
 
@@ -46,7 +46,26 @@ class GroupOut(GroupCreate):
     """Schema for returning group data, including its unique ID."""
     id: str # Changed from group_id for consistency
     created_by: str
-    members: Optional[List[str]] = []
+    member_count: int = 0
+
+class GroupSummary(GroupCreate):
+    """A group as it appears in listings: a member count instead of the member list."""
+    id: str
+    created_by: str
+    created_at: Optional[str] = None
+    member_count: int = 0
+    is_member: bool = False
+
+class GroupPage(BaseModel):
+    """One page of groups; pass next_cursor back to get the following page."""
+    groups: List[GroupSummary]
+    next_cursor: Optional[str] = None
+
+class GroupMembersPage(BaseModel):
+    """One page of a group's member IDs."""
+    group_id: str
+    members: List[str]
+    next_cursor: Optional[str] = None
 
 
 # ==================================
@@ -67,6 +86,15 @@ class ChallengeOut(BaseModel):
     created_by: str
     problem_statement: Optional[str] = None
 
+class ChallengeJobOut(BaseModel):
+    """Status of an asynchronous challenge-generation job."""
+    id: str
+    challenge_id: str
+    status: str # queued | running | completed | failed
+    stages: Dict[str, str] = {}
+    error: Optional[str] = None
+    challenge: Optional[ChallengeOut] = None # Set once the job has completed
+
 # ==================================
 # Submission Schemas
 # ==================================
@@ -98,6 +126,29 @@ class GroupLeaderboardEntry(LeaderboardEntry):
     """Extends the leaderboard entry with a group_id."""
     group_id: str
 
+class LeaderboardPage(BaseModel):
+    """One page of a leaderboard; pass next_cursor back to get the following page."""
+    entries: List[LeaderboardEntry]
+    next_cursor: Optional[str] = None
+
+class GroupLeaderboardPage(BaseModel):
+    """One page of a group leaderboard."""
+    entries: List[GroupLeaderboardEntry]
+    next_cursor: Optional[str] = None
+
+class RankedLeaderboardEntry(GroupLeaderboardEntry):
+    """A group leaderboard entry with its 1-based position."""
+    rank: int
+    xp: int = 0
+
+class GroupDashboard(BaseModel):
+    """Everything the group page needs, in one response."""
+    group: GroupOut
+    leaderboard: List[GroupLeaderboardEntry]
+    challenges: List[ChallengeOut]
+    submissions: List[SubmissionOut]
+
+
 
 
 
@@ -1,6 +1,118 @@
+import os
+import asyncio
+import aiohttp
+from dotenv import load_dotenv
 from elasticsearch import AsyncElasticsearch
-from elasticsearch_dsl import connections
+from elastic_transport import AiohttpHttpNode
 
+load_dotenv()
 
-es = AsyncElasticsearch("http://localhost:9200")
-connections.create_connection(hosts=["http://localhost:9200"])
\ No newline at end of file
+# --- Environment ---
+ELASTICSEARCH_URL = os.getenv("ELASTICSEARCH_URL")
+ELASTICSEARCH_API_KEY = os.getenv("ELASTICSEARCH_API_KEY")
+
+# --- Pool tuning ---
+ES_CONNECTIONS_PER_NODE = int(os.getenv("ES_CONNECTIONS_PER_NODE", "25"))
+ES_KEEPALIVE_TIMEOUT = float(os.getenv("ES_KEEPALIVE_TIMEOUT", "60"))
+ES_HTTP_COMPRESS = os.getenv("ES_HTTP_COMPRESS", "true").lower() == "true"
+ES_REQUEST_TIMEOUT = float(os.getenv("ES_REQUEST_TIMEOUT", "10"))
+
+_es: AsyncElasticsearch | None = None
+
+
+class KeepAliveAiohttpNode(AiohttpHttpNode):
+    """
+    Same as the default aiohttp node, but idle sockets are kept open for
+    ES_KEEPALIVE_TIMEOUT seconds instead of aiohttp's 15s default, and
+    requests in flight are counted for es_pool_stats().
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_flight = 0
+
+    def _create_aiohttp_session(self) -> None:
+        # Mirrors AiohttpHttpNode's session, with the keep-alive set on the connector up front
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            skip_auto_headers=("accept", "accept-encoding", "user-agent"),
+            auto_decompress=True,
+            loop=self._loop,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            connector=aiohttp.TCPConnector(
+                limit_per_host=self._connections_per_node,
+                keepalive_timeout=ES_KEEPALIVE_TIMEOUT,
+                use_dns_cache=True,
+                ssl=self._ssl_context or False,
+            ),
+        )
+
+    async def perform_request(self, *args, **kwargs):
+        self.in_flight += 1
+        try:
+            return await super().perform_request(*args, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+def _create_client() -> AsyncElasticsearch:
+    if not ELASTICSEARCH_URL:
+        raise RuntimeError("Elasticsearch config missing")
+
+    kwargs = {
+        "node_class": KeepAliveAiohttpNode,
+        "connections_per_node": ES_CONNECTIONS_PER_NODE,
+        "http_compress": ES_HTTP_COMPRESS,
+        "request_timeout": ES_REQUEST_TIMEOUT,
+    }
+    if ELASTICSEARCH_API_KEY:
+        kwargs["api_key"] = ELASTICSEARCH_API_KEY
+
+    return AsyncElasticsearch(ELASTICSEARCH_URL, **kwargs)
+
+
+def get_es() -> AsyncElasticsearch:
+    """
+    Returns the process-wide Elasticsearch client. Every module must go
+    through this instead of building its own AsyncElasticsearch, so the
+    whole app shares one connection pool.
+    """
+    global _es
+    if _es is None:
+        _es = _create_client()
+    return _es
+
+
+async def close_es():
+    """Closes the shared client and its pooled sockets. Called on app shutdown."""
+    global _es
+    if _es is not None:
+        await _es.close()
+        _es = None
+
+
+def es_pool_stats() -> dict:
+    """
+    Reports how much of the connection pool is in use, per node: each
+    request in flight holds one connection.
+    """
+    nodes = []
+    if _es is not None:
+        for node in _es.transport.node_pool.all():
+            in_use = getattr(node, "in_flight", 0)
+            nodes.append({
+                "node": str(node.base_url),
+                "in_use": in_use,
+                "limit": ES_CONNECTIONS_PER_NODE,
+                "utilisation": round(in_use / ES_CONNECTIONS_PER_NODE, 3),
+            })
+
+    return {
+        "initialized": _es is not None,
+        "connections_per_node": ES_CONNECTIONS_PER_NODE,
+        "keepalive_timeout": ES_KEEPALIVE_TIMEOUT,
+        "http_compress": ES_HTTP_COMPRESS,
+        "nodes": nodes,
+    }
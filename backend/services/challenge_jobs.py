@@ -0,0 +1,232 @@
+import os
+import asyncio
+from services.worker_pool import WorkerPool
+from services.dify_agents import (
+    trigger_agent_1,
+    trigger_agent_2_breakdown,
+    trigger_agent_3_testcases,
+)
+from services.sns_notify import notify_member_of_new_repo
+from services.github_service import create_challenge_repository_and_invite
+from manager.challenge_job_manager import (
+    CHALLENGE_JOB_INDEX,
+    UNFINISHED_JOB_STATUSES,
+    create_challenge_job,
+    update_challenge_job,
+    get_unfinished_challenge_jobs,
+)
+from manager.group_manager_es import get_group_members_es
+from manager.auth_manager import get_user_by_id
+from utils.es_utils import save_challenge_artifacts
+from utils.loader import loader_scope
+from utils.lease import claim, release
+
+CHALLENGE_JOB_WORKERS = int(os.getenv("CHALLENGE_JOB_WORKERS", "4"))
+CHALLENGE_JOB_QUEUE_SIZE = int(os.getenv("CHALLENGE_JOB_QUEUE_SIZE", "100"))
+
+# Repo setup runs detached from the job; keep references so tasks aren't GC'd mid-flight
+_repo_tasks: set[asyncio.Task] = set()
+
+
+# --- Repo setup ---
+async def setup_challenge_repos_for_group(
+    challenge_id: str,
+    group_id: str,
+    challenge_topic: str
+):
+    """
+    Creates a unique, private GitHub repo for each member of a group.
+    """
+    print(f"🚀 Starting background task: Create repos for challenge {challenge_id}")
+
+    with loader_scope():
+        member_ids = await get_group_members_es(group_id)
+        if not member_ids:
+            print(f"[WARN] No members found for group {group_id}.")
+            return
+        # Issued together, so the loader fetches every member in one mget
+        users = await asyncio.gather(*(get_user_by_id(user_id) for user_id in member_ids))
+
+    for user_id, user in zip(member_ids, users):
+        if not user:
+            print(f"[WARN] User {user_id} not found. Skipping.")
+            continue
+
+        email = user.get("email")
+        github_username = user.get("github_username")
+
+        if not email or not github_username:
+            print(f"[WARN] User {user_id} missing email or GitHub username. Skipping.")
+            continue
+
+        print(f"Creating repo for challenge '{challenge_id}' for user '{github_username}'...")
+
+        # Correctly call the service with structured IDs
+        repo_details = create_challenge_repository_and_invite(
+            challenge_id=challenge_id,
+            user_id=user_id,
+            collaborator_username=github_username
+        )
+
+        if not repo_details:
+            print(f"❌ Repo creation failed for user {user_id}.")
+            continue
+
+        # Notify the user with details returned from the service
+        notify_member_of_new_repo(
+            email=email,
+            challenge_title=challenge_topic,
+            repo_name=repo_details["repo_name"],
+            clone_url=repo_details["clone_url"]
+        )
+        await asyncio.sleep(2) # Avoid hitting API rate limits
+
+    print(f"✅ Repo setup completed for challenge {challenge_id}")
+
+
+# --- Generation pipeline ---
+async def _set_stage(job_id: str, stage: str, state: str, outputs: dict | None = None):
+    fields = {"stages": {stage: state}}
+    if outputs:
+        fields["outputs"] = outputs
+    await update_challenge_job(job_id, fields)
+
+
+async def run_challenge_job(job: dict):
+    """
+    Claims the job, so no other worker runs it (and creates its repos) at
+    the same time, then runs it. Jobs another worker holds are skipped.
+    """
+    job_id = job["id"]
+    if not await claim(CHALLENGE_JOB_INDEX, job_id, "status", UNFINISHED_JOB_STATUSES):
+        print(f"⚠ Challenge job {job_id} is finished or owned by another worker, skipping")
+        return
+    try:
+        await _run_claimed_job(job)
+    except asyncio.CancelledError:
+        # Shutting down: release_held_leases() hands the job to the next sweep
+        raise
+    except Exception:
+        release(CHALLENGE_JOB_INDEX, job_id)
+        raise
+    release(CHALLENGE_JOB_INDEX, job_id)
+
+
+async def _run_claimed_job(job: dict):
+    """
+    Runs agent 1 -> (agent 2 + agent 3) -> save for one job, persisting each
+    stage. Outputs already stored on the job are reused, so a job that was
+    interrupted by a restart picks up where it stopped.
+    """
+    job_id = job["id"]
+    doc = dict(job["challenge"])
+    challenge_id = doc["id"]
+    user_id = doc["created_by"]
+    outputs = dict(job.get("outputs") or {})
+
+    await update_challenge_job(job_id, {"status": "running"})
+    stage = "problem_statement"
+
+    try:
+        if not outputs.get("problem_statement"):
+            print(f"[{challenge_id}] Triggering agents for topic: {doc['Topic']}")
+            await _set_stage(job_id, stage, "running")
+            problem_statement = await trigger_agent_1(Topic=doc["Topic"], difficulty=doc["difficulty"], user_id=user_id)
+            outputs["problem_statement"] = problem_statement.get("data", {}).get("outputs", {}).get("answer", "").strip()
+            if not outputs["problem_statement"]:
+                raise ValueError("Agent 1 (Problem Statement) returned empty.")
+            await _set_stage(job_id, stage, "completed", {"problem_statement": outputs["problem_statement"]})
+        doc["problem_statement"] = outputs["problem_statement"]
+
+        stage = "breakdown/testcases"
+        if "breakdown" not in outputs or "testcases" not in outputs:
+            await update_challenge_job(job_id, {"stages": {"breakdown": "running", "testcases": "running"}})
+
+            # Agents 2 and 3 only need the problem statement, so run them side by side.
+            # If one fails, the other is cancelled instead of burning a full LLM call.
+            breakdown_task = asyncio.create_task(
+                trigger_agent_2_breakdown(statement=doc["problem_statement"], user_id=user_id)
+            )
+            test_task = asyncio.create_task(
+                trigger_agent_3_testcases(prompt=doc["problem_statement"], user_id=user_id)
+            )
+            try:
+                breakdown_result, test_result = await asyncio.gather(breakdown_task, test_task)
+            except BaseException:
+                breakdown_task.cancel()
+                test_task.cancel()
+                raise
+
+            outputs["breakdown"] = breakdown_result.get("data", {}).get("outputs", {}).get("answer", {}).get("api", "")
+            outputs["testcases"] = test_result.get("data", {}).get("outputs", {}).get("answer", {}).get("raw_text_from_previous_step", "")
+            await update_challenge_job(job_id, {
+                "stages": {"breakdown": "completed", "testcases": "completed"},
+                "outputs": {"breakdown": outputs["breakdown"], "testcases": outputs["testcases"]},
+            })
+
+        # Save all generated content in one round trip
+        stage = "save"
+        await _set_stage(job_id, stage, "running")
+        await save_challenge_artifacts(doc, outputs["breakdown"], outputs["testcases"])
+        await update_challenge_job(job_id, {"stages": {stage: "completed"}, "status": "completed"})
+        print(f"[{challenge_id}] ✅ Agent generation complete.")
+
+    except Exception as e:
+        print(f"❌ Exception during agent orchestration ({stage}): {e}")
+        failed_stages = {name: "failed" for name in stage.split("/")}
+        await update_challenge_job(job_id, {"stages": failed_stages, "status": "failed", "error": f"Agent failure: {e}"})
+        return
+
+    task = asyncio.create_task(setup_challenge_repos_for_group(
+        challenge_id=challenge_id,
+        group_id=doc["group_id"],
+        challenge_topic=doc["Topic"],
+    ))
+    _repo_tasks.add(task)
+    task.add_done_callback(_repo_tasks.discard)
+    print(f"[{challenge_id}] ✅ Background task for repo setup scheduled.")
+
+
+challenge_job_pool = WorkerPool(
+    name="challenge-jobs",
+    handler=run_challenge_job,
+    workers=CHALLENGE_JOB_WORKERS,
+    max_depth=CHALLENGE_JOB_QUEUE_SIZE,
+)
+
+
+async def enqueue_challenge(doc: dict) -> dict:
+    """
+    Persists a job for the challenge and queues it. If the queue is full the
+    job is marked failed and asyncio.QueueFull is re-raised.
+    """
+    job = await create_challenge_job(doc)
+    try:
+        challenge_job_pool.submit(job["id"], job)
+    except asyncio.QueueFull:
+        release(CHALLENGE_JOB_INDEX, job["id"])
+        await update_challenge_job(job["id"], {"status": "failed", "error": "Challenge generation queue is full."})
+        raise
+    return job
+
+
+async def resume_challenge_jobs():
+    """
+    Re-queues jobs that were queued or running when their worker stopped.
+    Each one is claimed first, so a job another live worker holds is never
+    run twice.
+    """
+    jobs = await get_unfinished_challenge_jobs()
+    resumed = 0
+    for job in jobs:
+        if not await claim(CHALLENGE_JOB_INDEX, job["id"], "status", UNFINISHED_JOB_STATUSES):
+            continue
+        try:
+            if challenge_job_pool.submit(job["id"], job):
+                resumed += 1
+        except asyncio.QueueFull:
+            release(CHALLENGE_JOB_INDEX, job["id"])
+            print("[WARN] Challenge job queue full, remaining jobs wait for the next sweep.")
+            break
+    if resumed:
+        print(f"🔁 Resumed {resumed} challenge generation jobs")
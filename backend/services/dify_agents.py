@@ -1,4 +1,5 @@
 import os
+import asyncio
 import httpx
 import json
 from dotenv import load_dotenv
@@ -18,9 +19,73 @@ DIFY_AGENT_3_API_KEY = os.getenv("DIFY_AGENT_3_API_KEY")
 DIFY_AGENT_4_API_URL = os.getenv("DIFY_AGENT_4_API_URL")
 DIFY_AGENT_4_API_KEY = os.getenv("DIFY_AGENT_4_API_KEY")
 
+# --- Connection pool tuning (one pool per agent; Dify workflow apps share one URL and differ by API key) ---
+DIFY_TIMEOUT = float(os.getenv("DIFY_TIMEOUT", "120"))
+DIFY_MAX_CONNECTIONS = int(os.getenv("DIFY_MAX_CONNECTIONS", "20"))
+DIFY_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("DIFY_MAX_KEEPALIVE_CONNECTIONS", "10"))
+DIFY_KEEPALIVE_EXPIRY = float(os.getenv("DIFY_KEEPALIVE_EXPIRY", "60"))
+DIFY_HTTP2 = os.getenv("DIFY_HTTP2", "true").lower() == "true"
+# Max in-flight calls per agent; extra callers wait for a slot instead of opening sockets
+DIFY_AGENT_CONCURRENCY = int(os.getenv("DIFY_AGENT_CONCURRENCY", "8"))
+
+# All keyed by agent name
+_clients: dict[str, httpx.AsyncClient] = {}
+_semaphores: dict[str, asyncio.Semaphore] = {}
+_waiting: dict[str, int] = {}
+_in_flight: dict[str, int] = {}
+
+
+def _get_client(agent: str) -> httpx.AsyncClient:
+    """Returns the long-lived client for an agent, creating it on first use."""
+    client = _clients.get(agent)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=DIFY_HTTP2,
+            timeout=DIFY_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=DIFY_MAX_CONNECTIONS,
+                max_keepalive_connections=DIFY_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=DIFY_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _clients[agent] = client
+    return client
+
+
+def _get_semaphore(agent: str) -> asyncio.Semaphore:
+    if agent not in _semaphores:
+        _semaphores[agent] = asyncio.Semaphore(DIFY_AGENT_CONCURRENCY)
+    return _semaphores[agent]
+
+
+async def close_dify_clients():
+    """Closes every agent connection pool. Called on app shutdown."""
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
+
+
+def dify_pool_stats() -> dict:
+    """Per-agent view of the pools: open clients, busy slots and queued callers."""
+    return {
+        "http2": DIFY_HTTP2,
+        "concurrency_per_agent": DIFY_AGENT_CONCURRENCY,
+        "agents": {
+            agent: {
+                "client_open": agent in _clients and not _clients[agent].is_closed,
+                "in_flight": _in_flight.get(agent, 0),
+                "waiting": _waiting.get(agent, 0),
+            }
+            for agent in _semaphores
+        },
+    }
+
 
-async def _safe_post(url: str, payload: dict, api_key: str):
-    """Safely performs a POST request with the correct authentication for each agent."""
+async def _safe_post(agent: str, url: str, payload: dict, api_key: str):
+    """
+    Safely performs a POST request with the correct authentication for each agent.
+    Concurrency is limited per `agent`, so one busy agent can't starve the others.
+    """
     if not url or not api_key:
         raise ValueError("Dify agent URL or API Key is not configured in .env file.")
 
@@ -29,43 +94,55 @@ async def _safe_post(url: str, payload: dict, api_key: str):
         "Content-Type": "application/json"
     }
 
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        try:
-            response = await client.post(url, headers=headers, json=payload)
-            print("\n--- Dify Raw Response ---")
-            print(f"URL: {url}")
-            print(f"Status Code: {response.status_code}")
-            print(f"Response Body: {response.text}")
-            print("-------------------------\n")
-            response.raise_for_status()
-            
-            data = response.json()
-            if data.get("status") == "failed":
-                raise RuntimeError(f"Dify agent at {url} failed with error: {data.get('error')}")
-            
-            return data
-
-        except httpx.HTTPStatusError as e:
-            raise RuntimeError(f"HTTP error {e.response.status_code} for URL {url}: {e.response.text}")
-        except json.JSONDecodeError:
-            raise ValueError(f"Invalid JSON from Dify for URL {url}. Raw response:\n{repr(response.text)}")
-        except Exception as e:
-            raise RuntimeError(f"An unexpected error occurred while calling Dify agent at {url}: {e}")
+    client = _get_client(agent)
+    semaphore = _get_semaphore(agent)
+
+    _waiting[agent] = _waiting.get(agent, 0) + 1
+    try:
+        await semaphore.acquire()
+    finally:
+        _waiting[agent] -= 1
+    _in_flight[agent] = _in_flight.get(agent, 0) + 1
+
+    try:
+        response = await client.post(url, headers=headers, json=payload)
+        print("\n--- Dify Raw Response ---")
+        print(f"URL: {url}")
+        print(f"Status Code: {response.status_code}")
+        print(f"Response Body: {response.text}")
+        print("-------------------------\n")
+        response.raise_for_status()
+        
+        data = response.json()
+        if data.get("status") == "failed":
+            raise RuntimeError(f"Dify agent at {url} failed with error: {data.get('error')}")
+        
+        return data
+
+    except httpx.HTTPStatusError as e:
+        raise RuntimeError(f"HTTP error {e.response.status_code} for URL {url}: {e.response.text}")
+    except json.JSONDecodeError:
+        raise ValueError(f"Invalid JSON from Dify for URL {url}. Raw response:\n{repr(response.text)}")
+    except Exception as e:
+        raise RuntimeError(f"An unexpected error occurred while calling Dify agent at {url}: {e}")
+    finally:
+        _in_flight[agent] -= 1
+        semaphore.release()
 
 
 # (trigger_agent_1, trigger_agent_2_breakdown, trigger_agent_3_testcases remain the same)
 # ...
 async def trigger_agent_1(Topic: str, difficulty: str, user_id: str):
     payload = { "inputs": { "Topic": Topic, "difficulty": difficulty }, "response_mode": "blocking", "user": user_id }
-    return await _safe_post(DIFY_AGENT_1_API_URL, payload, DIFY_AGENT_1_API_KEY)
+    return await _safe_post("agent_1", DIFY_AGENT_1_API_URL, payload, DIFY_AGENT_1_API_KEY)
 
 async def trigger_agent_2_breakdown(statement: str, user_id: str):
     payload = { "inputs": { "statement": statement }, "response_mode": "blocking", "user": user_id }
-    return await _safe_post(DIFY_AGENT_2_API_URL, payload, DIFY_AGENT_2_API_KEY)
+    return await _safe_post("agent_2", DIFY_AGENT_2_API_URL, payload, DIFY_AGENT_2_API_KEY)
 
 async def trigger_agent_3_testcases(prompt: str, user_id: str):
     payload = { "inputs": { "prompt": prompt }, "response_mode": "blocking", "user": user_id }
-    return await _safe_post(DIFY_AGENT_3_API_URL, payload, DIFY_AGENT_3_API_KEY)
+    return await _safe_post("agent_3", DIFY_AGENT_3_API_URL, payload, DIFY_AGENT_3_API_KEY)
 
 
 # --- Agent 4: Evaluate Submission (UPDATED) ---
@@ -82,4 +159,4 @@ async def trigger_agent_4_evaluation(user_code: str, test_cases: str, user_id: s
         "response_mode": "blocking",
         "user": user_id
     }
-    return await _safe_post(DIFY_AGENT_4_API_URL, payload, DIFY_AGENT_4_API_KEY)
\ No newline at end of file
+    return await _safe_post("agent_4", DIFY_AGENT_4_API_URL, payload, DIFY_AGENT_4_API_KEY)
\ No newline at end of file
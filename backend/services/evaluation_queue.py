@@ -0,0 +1,225 @@
+import os
+import json
+import asyncio
+import traceback
+from datetime import datetime, timezone
+
+from services.worker_pool import WorkerPool
+from services.dify_agents import trigger_agent_4_evaluation
+from manager.testcase_manager import get_testcases_by_challenge
+from manager.evaluation_cache import (
+    evaluation_cache_key,
+    get_cached_evaluation,
+    save_cached_evaluation,
+)
+from utils.es_utils import update_leaderboard_xp, SUBMISSION_INDEX
+from utils.git_utils import get_code_from_repo
+from utils.bulk_writer import bulk_writer
+from utils.lease import claim, release, hold, lease_fields, expired_lease_query
+from search.connection import get_es
+from elasticsearch import ConflictError
+
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "4"))
+EVAL_QUEUE_SIZE = int(os.getenv("EVAL_QUEUE_SIZE", "200"))
+EVAL_MAX_ATTEMPTS = int(os.getenv("EVAL_MAX_ATTEMPTS", "3"))
+EVAL_RETRY_BACKOFF = float(os.getenv("EVAL_RETRY_BACKOFF", "5"))  # seconds, doubled per retry
+
+
+async def _clone_and_evaluate(submission_doc: dict, testcases_str: str | None) -> tuple[dict, str | None]:
+    """
+    Returns the evaluation, and the cache key to store it under if it came
+    from Agent 4 rather than the evaluation cache.
+    """
+    print(f"📥 Cloning repo: {submission_doc['clone_url']} at commit {submission_doc['commit_hash']}")
+    user_code_str = await get_code_from_repo(
+        clone_url=submission_doc["clone_url"],
+        commit_hash=submission_doc["commit_hash"]
+    )
+    print(f"✅ Repo cloned")
+
+    # Same code against the same testcases always gets the same verdict
+    cache_key = evaluation_cache_key(user_code_str, testcases_str)
+    cached = await get_cached_evaluation(cache_key)
+    if cached:
+        print(f"♻ Reusing cached evaluation {cache_key[:12]} for commit {submission_doc['commit_hash']}")
+        return cached, None
+
+    print(f"🤖 Triggering Agent 4 evaluation...")
+    result = await trigger_agent_4_evaluation(
+        user_code=user_code_str,
+        test_cases=testcases_str,
+        user_id=submission_doc["user_id"]
+    )
+    print(f"✅ Agent 4 triggered")
+    print("📦 Raw Agent 4 Answer:")
+    print(json.dumps(result.get("data", {}).get("outputs", {}), indent=2))
+
+    outputs = result.get("data", {}).get("outputs", {})
+    evaluation = {
+        "score": float(outputs.get("score", 0.0)),
+        "feedback": outputs.get("feedback", ""),
+    }
+    return evaluation, cache_key
+
+
+async def _cache_evaluation(cache_key: str, evaluation: dict):
+    # Best effort: a failed cache write must not fail or re-run the evaluation
+    try:
+        await save_cached_evaluation(cache_key, evaluation["score"], evaluation["feedback"])
+    except Exception as e:
+        print(f"[WARN] Could not cache evaluation {cache_key[:12]}: {e}")
+
+
+async def process_submission(submission_doc: dict):
+    """
+    Evaluates one submission. Git and agent failures are retried with
+    exponential backoff; the submission stays 'pending' until the final
+    status is written, so an interrupted run is picked up by the sweep once
+    this worker's lease on it lapses.
+    """
+    submission_id = submission_doc["id"]
+    if not await claim(SUBMISSION_INDEX, submission_id, "status", ["pending"]):
+        print(f"⚠ Submission {submission_id} is finished or owned by another worker, skipping")
+        return
+    try:
+        await _evaluate_claimed(submission_doc)
+    except asyncio.CancelledError:
+        # Shutting down: release_held_leases() hands the submission to the next sweep
+        raise
+    except Exception:
+        release(SUBMISSION_INDEX, submission_id)
+        raise
+    release(SUBMISSION_INDEX, submission_id)
+
+
+async def _evaluate_claimed(submission_doc: dict):
+    submission_id = submission_doc["id"]
+    print(f"🚀 Starting evaluation for submission: {submission_id}")
+    final_status = {"status": "error", "score": 0.0}
+
+    try:
+        testcases_str = await get_testcases_by_challenge(submission_doc["challenge_id"])
+
+        for attempt in range(1, EVAL_MAX_ATTEMPTS + 1):
+            try:
+                evaluation, cache_key = await _clone_and_evaluate(submission_doc, testcases_str)
+                break
+            except Exception as e:
+                if attempt == EVAL_MAX_ATTEMPTS:
+                    raise
+                delay = EVAL_RETRY_BACKOFF * 2 ** (attempt - 1)
+                print(f"⚠ Attempt {attempt}/{EVAL_MAX_ATTEMPTS} failed for {submission_id}: {e}. Retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+
+        if cache_key:
+            await _cache_evaluation(cache_key, evaluation)
+
+        score = evaluation["score"]
+        feedback = evaluation["feedback"]
+
+        final_status = {
+            "status": "completed",
+            "score": score,
+            "feedback": feedback
+        }
+
+        print(f"✅ Evaluation complete for {submission_id}. Score: {score}")
+
+        if score > 0:
+            await update_leaderboard_xp(
+                submission_id=submission_id,
+                user_id=submission_doc["user_id"],
+                challenge_id=submission_doc["challenge_id"],
+                xp_to_add=submission_doc.get("xp", 0),
+                username=submission_doc.get("username", submission_doc["user_id"]),
+                score=score,
+                feedback=feedback
+            )
+
+    except Exception as e:
+        print(f"❌ Evaluation process failed for {submission_id}: {e}")
+        print(traceback.format_exc())
+
+    final_doc = {
+        **final_status,
+        "processed_at": datetime.now(timezone.utc)
+    }
+    await bulk_writer.update(SUBMISSION_INDEX, submission_id, doc=final_doc)
+    print(f"✅ Submission saved to Elasticsearch with status: {final_status['status']}")
+
+
+evaluation_pool = WorkerPool(
+    name="evaluations",
+    handler=process_submission,
+    workers=EVAL_WORKERS,
+    max_depth=EVAL_QUEUE_SIZE,
+)
+
+
+def enqueue_submission(submission_doc: dict) -> bool:
+    """
+    Queues a submission for evaluation, deduplicated on its ID.
+    Returns False if it is already queued or being evaluated here.
+    Raises asyncio.QueueFull when the queue is at capacity.
+    """
+    return evaluation_pool.submit(submission_doc["id"], submission_doc)
+
+
+async def accept_submission(submission_doc: dict) -> bool:
+    """
+    Entry point for new submissions. The 'pending' document is created
+    first, so an acknowledged push survives a restart. Its ID comes from
+    the commit (see the webhook), so a commit that was already submitted,
+    to this or another worker, is rejected by Elasticsearch. The create is
+    a direct call rather than a buffered bulk op, so the ack doesn't wait
+    out the writer's flush interval.
+    Only then is the evaluation queued, so its result can't be overwritten
+    by the pending insert. The document is created already leased to this
+    worker, so no other worker's sweep picks it up while it waits here.
+    Returns False if the commit was already submitted. Raises
+    asyncio.QueueFull when the queue is at capacity; the pending document
+    is removed again so a redelivery can retry.
+    """
+    submission_doc = {**submission_doc, **lease_fields()}
+    try:
+        await get_es().create(index=SUBMISSION_INDEX, id=submission_doc["id"], document=submission_doc)
+    except ConflictError:
+        return False
+
+    hold(SUBMISSION_INDEX, submission_doc["id"])
+    try:
+        return enqueue_submission(submission_doc)
+    except asyncio.QueueFull:
+        release(SUBMISSION_INDEX, submission_doc["id"])
+        await get_es().options(ignore_status=404).delete(index=SUBMISSION_INDEX, id=submission_doc["id"])
+        raise
+
+
+async def requeue_pending_submissions():
+    """
+    Sweep: re-queues submissions left 'pending' by a stopped or dead worker.
+    Each one is claimed first, so a submission another live worker holds is
+    never evaluated twice.
+    """
+    if not await get_es().indices.exists(index=SUBMISSION_INDEX):
+        return
+
+    res = await get_es().search(
+        index=SUBMISSION_INDEX,
+        query={"bool": {"filter": [{"term": {"status": "pending"}}, expired_lease_query()]}},
+        sort=[{"created_at": {"order": "asc", "unmapped_type": "date"}}],
+        size=EVAL_QUEUE_SIZE,
+    )
+    requeued = 0
+    for hit in res["hits"]["hits"]:
+        if not await claim(SUBMISSION_INDEX, hit["_id"], "status", ["pending"]):
+            continue
+        try:
+            if enqueue_submission({**hit["_source"], "id": hit["_id"]}):
+                requeued += 1
+        except asyncio.QueueFull:
+            release(SUBMISSION_INDEX, hit["_id"])
+            print("[WARN] Evaluation queue full, remaining pending submissions wait for the next sweep.")
+            break
+    if requeued:
+        print(f"🔁 Re-queued {requeued} pending submissions")
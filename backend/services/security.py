@@ -1,10 +1,13 @@
 import os
+import time
+import hashlib
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from schemas.schemas import TokenData
+from utils.cache import TTLCache
 # DO NOT import from manager.auth_manager at the top level to avoid circular imports.
 
 load_dotenv()
@@ -14,6 +17,10 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60*7
 REFRESH_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# sha256(token) -> TokenData; entries expire with the token itself
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
 # Used by Swagger UI's "Authorize" button
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -36,21 +43,37 @@ def create_refresh_token(user_id: str, email: str) -> str:
     )
 
 def decode_token(token: str) -> TokenData | None:
+    """
+    Verifies and decodes a JWT. A token that already verified is served
+    from token_cache until its `exp`, so a session's repeated requests
+    don't re-check the signature every time.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    token_data = token_cache.get(key)
+    if token_data is not None:
+        return token_data
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return TokenData(
-            user_id=payload.get("user_id"),
-            email=payload.get("email"),
-        )
     except JWTError:
         return None
 
+    token_data = TokenData(
+        user_id=payload.get("user_id"),
+        email=payload.get("email"),
+    )
+    exp = payload.get("exp")
+    ttl = exp - time.time() if exp else None
+    if ttl is None or ttl > 0:
+        token_cache.set(key, token_data, ttl=ttl)
+    return token_data
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     """
     Decodes the JWT token, validates it, and fetches the current user.
     """
     # --- FIX: Import is moved inside the function to break the circular dependency ---
-    from manager.auth_manager import get_user_by_email
+    from manager.auth_manager import get_cached_user_by_email
 
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -62,7 +85,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     if not token_data or not token_data.email:
         raise credentials_exception
 
-    user = await get_user_by_email(token_data.email)
+    user = await get_cached_user_by_email(token_data.email)
     if not user:
         raise credentials_exception
 
@@ -0,0 +1,91 @@
+import asyncio
+import traceback
+from typing import Any, Awaitable, Callable
+
+
+class WorkerPool:
+    """
+    A fixed number of asyncio workers draining a bounded queue.
+
+    Items are keyed; a key that is already queued or running is not
+    accepted twice. submit() raises asyncio.QueueFull when the queue is at
+    max_depth so callers can push back instead of piling up work.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Awaitable[None]],
+        workers: int,
+        max_depth: int,
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.max_depth = max_depth
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._keys: set[str] = set()
+        self._running = 0
+        self._processed = 0
+        self._failed = 0
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_depth)
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"{self.name}-{i}")
+            for i in range(self.workers)
+        ]
+        print(f"✅ {self.name}: started {self.workers} workers (max depth {self.max_depth})")
+
+    async def stop(self):
+        """Cancels the workers. Anything still queued is dropped, so callers must persist their own state."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._keys.clear()
+
+    def submit(self, key: str, item: Any) -> bool:
+        """
+        Queues an item. Returns False if the key is already queued or running.
+        Raises asyncio.QueueFull when the queue is at capacity.
+        """
+        if self._queue is None:
+            raise RuntimeError(f"{self.name} is not running")
+        if key in self._keys:
+            return False
+        self._queue.put_nowait((key, item))
+        self._keys.add(key)
+        return True
+
+    async def _worker(self, index: int):
+        while True:
+            key, item = await self._queue.get()
+            self._running += 1
+            try:
+                await self.handler(item)
+                self._processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failed += 1
+                print(f"❌ {self.name}: worker {index} failed on {key}: {e}")
+                print(traceback.format_exc())
+            finally:
+                self._running -= 1
+                self._keys.discard(key)
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_depth": self.max_depth,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": self._running,
+            "processed": self._processed,
+            "failed": self._failed,
+        }
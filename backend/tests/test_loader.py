@@ -0,0 +1,64 @@
+import asyncio
+
+import utils.loader as loader
+
+
+class StubES:
+    """Answers mget after a short delay and records every batch of IDs."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def mget(self, index, ids):
+        self.calls.append(list(ids))
+        await asyncio.sleep(0.01)
+        return {"docs": [{"_id": doc_id, "found": True, "_source": {"id": doc_id}} for doc_id in ids]}
+
+
+def test_concurrent_loads_share_one_mget(monkeypatch):
+    es = StubES()
+    monkeypatch.setattr(loader, "get_es", lambda: es)
+
+    async def run():
+        with loader.loader_scope():
+            return await asyncio.gather(*(loader.load_doc("users", doc_id) for doc_id in ["a", "b", "a"]))
+
+    assert asyncio.run(run()) == [{"id": "a"}, {"id": "b"}, {"id": "a"}]
+    assert es.calls == [["a", "b"]]
+
+
+def test_cancelled_caller_does_not_cancel_shared_lookup(monkeypatch):
+    es = StubES()
+    monkeypatch.setattr(loader, "get_es", lambda: es)
+
+    async def run():
+        with loader.loader_scope():
+            cancelled = asyncio.create_task(loader.load_doc("users", "a"))
+            waiting = asyncio.create_task(loader.load_doc("users", "a"))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            result = await waiting
+            # The memoised lookup is still usable afterwards in the same scope
+            again = await loader.load_doc("users", "a")
+            return cancelled.cancelled(), result, again
+
+    assert asyncio.run(run()) == (True, {"id": "a"}, {"id": "a"})
+    assert es.calls == [["a"]]
+
+
+def test_forget_during_fetch_still_resolves_waiters(monkeypatch):
+    es = StubES()
+    monkeypatch.setattr(loader, "get_es", lambda: es)
+
+    async def run():
+        with loader.loader_scope():
+            waiting = asyncio.create_task(loader.load_doc("users", "a"))
+            await asyncio.sleep(0.001)  # the mget is in flight
+            loader.forget_doc("users", "a")
+            result = await asyncio.wait_for(waiting, timeout=1)
+            # The forgotten ID is fetched again
+            again = await loader.load_doc("users", "a")
+            return result, again
+
+    assert asyncio.run(run()) == ({"id": "a"}, {"id": "a"})
+    assert es.calls == [["a"], ["a"]]
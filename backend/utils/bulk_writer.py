@@ -0,0 +1,177 @@
+import os
+import asyncio
+import traceback
+from collections import deque
+from elasticsearch import helpers
+from search.connection import get_es
+from utils.futures import consume_exception
+
+BULK_MAX_ACTIONS = int(os.getenv("BULK_MAX_ACTIONS", "500"))
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(5 * 1024 * 1024)))
+BULK_FLUSH_INTERVAL = float(os.getenv("BULK_FLUSH_INTERVAL", "0.2"))  # seconds
+BULK_ERROR_HISTORY = 20
+
+
+class BulkWriteError(RuntimeError):
+    """One buffered operation was rejected by Elasticsearch."""
+
+    def __init__(self, action: dict, item: dict):
+        self.action = action
+        self.item = item
+        op, result = next(iter(item.items()))
+        super().__init__(f"Bulk {op} failed for {result.get('_index')}/{result.get('_id')}: {result.get('error')}")
+
+
+class BulkWriter:
+    """
+    Buffers index/update operations and sends them as one _bulk request
+    when `max_actions` are pending or `flush_interval` seconds have passed.
+
+    Every call returns a future that resolves to the item's bulk response,
+    or fails with BulkWriteError, once its batch has been written. Callers
+    that need the write to be durable await it; the rest can drop it, as
+    failures are logged and counted either way. Operations are sent in the
+    order they were buffered.
+    """
+
+    def __init__(self, max_actions: int, max_bytes: int, flush_interval: float):
+        self.max_actions = max_actions
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self._buffer: list[tuple[dict, asyncio.Future]] = []
+        self._wakeup: asyncio.Event | None = None
+        self._lock: asyncio.Lock | None = None
+        self._task: asyncio.Task | None = None
+        self._flushes = 0
+        self._written = 0
+        self._failed = 0
+        self._errors: deque[str] = deque(maxlen=BULK_ERROR_HISTORY)
+
+    async def start(self):
+        if self._task:
+            return
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run(), name="bulk-writer")
+        print(f"✅ Bulk writer started (max {self.max_actions} actions, {self.flush_interval}s interval)")
+
+    async def stop(self):
+        """Stops the flush loop and writes whatever is still buffered."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    # --- Operations ---
+    def index(self, index: str, document: dict, id: str | None = None) -> asyncio.Future:
+        action = {"_op_type": "index", "_index": index, "_source": document}
+        if id is not None:
+            action["_id"] = id
+        return self._add(action)
+
+    def update(
+        self,
+        index: str,
+        id: str,
+        doc: dict | None = None,
+        script: dict | None = None,
+        upsert: dict | None = None,
+    ) -> asyncio.Future:
+        """A partial update, or a scripted one; `upsert` is the document to create if `id` is missing."""
+        body = {}
+        if doc is not None:
+            body["doc"] = doc
+        if script is not None:
+            body["script"] = script
+        if upsert is not None:
+            body["upsert"] = upsert
+        return self._add({"_op_type": "update", "_index": index, "_id": id, **body})
+
+    def upsert(self, index: str, id: str, doc: dict) -> asyncio.Future:
+        return self._add({"_op_type": "update", "_index": index, "_id": id, "doc": doc, "doc_as_upsert": True})
+
+    def _add(self, action: dict) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        if self._task is None:
+            # Scripts and one-off callers don't go through the app lifespan
+            loop.create_task(self.start())
+        future = loop.create_future()
+        future.add_done_callback(consume_exception)
+        self._buffer.append((action, future))
+        if len(self._buffer) >= self.max_actions and self._wakeup:
+            self._wakeup.set()
+        return future
+
+    # --- Flushing ---
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                print(f"❌ Bulk writer flush failed:\n{traceback.format_exc()}")
+
+    async def flush(self):
+        """Writes everything buffered so far and resolves the callers' futures."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while self._buffer:
+                batch, self._buffer = self._buffer[:self.max_actions], self._buffer[self.max_actions:]
+                await self._write(batch)
+
+    async def _write(self, batch: list[tuple[dict, asyncio.Future]]):
+        self._flushes += 1
+        pending = deque(batch)
+        try:
+            # streaming_bulk yields one result per action, in order, so results map back to futures
+            async for ok, item in helpers.async_streaming_bulk(
+                get_es(),
+                (action for action, _ in batch),
+                chunk_size=self.max_actions,
+                max_chunk_bytes=self.max_bytes,
+                raise_on_error=False,
+                raise_on_exception=False,
+            ):
+                action, future = pending.popleft()
+                if ok:
+                    self._written += 1
+                    if not future.done():
+                        future.set_result(item)
+                else:
+                    self._fail(future, BulkWriteError(action, item))
+        except Exception as e:
+            for action, future in pending:
+                self._fail(future, BulkWriteError(action, {action["_op_type"]: {
+                    "_index": action["_index"], "_id": action.get("_id"), "error": str(e),
+                }}))
+
+    def _fail(self, future: asyncio.Future, error: BulkWriteError):
+        self._failed += 1
+        self._errors.append(str(error))
+        print(f"❌ {error}")
+        if not future.done():
+            future.set_exception(error)
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "flushes": self._flushes,
+            "written": self._written,
+            "failed": self._failed,
+            "recent_errors": list(self._errors),
+        }
+
+
+bulk_writer = BulkWriter(
+    max_actions=BULK_MAX_ACTIONS,
+    max_bytes=BULK_MAX_BYTES,
+    flush_interval=BULK_FLUSH_INTERVAL,
+)
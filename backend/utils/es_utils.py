@@ -1,36 +1,41 @@
 import os
+import asyncio
 from typing import Dict, List
-from dotenv import load_dotenv
-from elasticsearch import AsyncElasticsearch
-from elasticsearch.exceptions import RequestError, NotFoundError
-
-# Load env early (local support)
-load_dotenv()
-
-# --- Environment ---
-ELASTICSEARCH_URL = os.getenv("ELASTICSEARCH_URL")
-ELASTICSEARCH_API_KEY = os.getenv("ELASTICSEARCH_API_KEY")
-
-if not ELASTICSEARCH_URL or not ELASTICSEARCH_API_KEY:
-    raise RuntimeError("Elasticsearch config missing")
-
-# --- Async Elasticsearch client ---
-es = AsyncElasticsearch(
-    ELASTICSEARCH_URL,
-    api_key=ELASTICSEARCH_API_KEY,
-    request_timeout=10
-)
+from elasticsearch import helpers
+from elasticsearch.exceptions import NotFoundError, RequestError
+from search.connection import get_es
+from utils.bulk_writer import bulk_writer, BulkWriteError
+from utils.rank_engine import rank_engine
+from utils.leaderboard_cache import invalidate_leaderboard
+from utils.cache import TTLCache
+from utils.loader import load_doc
+from utils.testcase_format import to_testcase_doc
+from manager.testcase_manager import cache_testcases
 
 # --- Index names ---
 CHALLENGE_INDEX = "challenges"
+BREAKDOWN_INDEX = "breakdowns"
+TESTCASE_INDEX = "testcases"
 SUBMISSION_INDEX = "submissions"
 LEADERBOARD_INDEX = "leaderboard"
+# One document per user with their totals over every group, so the global board pages like a group board
+GLOBAL_LEADERBOARD_INDEX = "leaderboard_global"
+
+# challenge_id -> the fields that never change after creation; LRU only, no expiry
+CHALLENGE_META_CACHE_SIZE = int(os.getenv("CHALLENGE_META_CACHE_SIZE", "4096"))
+CHALLENGE_META_FIELDS = ["group_id", "difficulty", "xp"]
+challenge_meta_cache = TTLCache(maxsize=CHALLENGE_META_CACHE_SIZE, ttl=float("inf"))
+
+# The rank engine is per process. With more than one worker (uvicorn --workers N) each
+# re-reads the leaderboard index this often, so group rankings served by one worker lag
+# awards made on another by at most this long. 0 disables the refresh: single worker only.
+RANK_ENGINE_REFRESH = float(os.getenv("RANK_ENGINE_REFRESH", "60"))  # seconds
 
 
 # --- Index Initialization ---
 async def init_indices():
-    if not await es.indices.exists(index=LEADERBOARD_INDEX):
-        await es.indices.create(
+    if not await get_es().indices.exists(index=LEADERBOARD_INDEX):
+        await get_es().indices.create(
             index=LEADERBOARD_INDEX,
             body={
                 "mappings": {
@@ -41,32 +46,86 @@ async def init_indices():
                         "xp": {"type": "integer"},
                         "score": {"type": "float"},
                         "feedback": {"type": "text"},
+                        "awarded": {"type": "keyword", "index": False},
                     }
                 }
             }
         )
 
+    if not await get_es().indices.exists(index=GLOBAL_LEADERBOARD_INDEX):
+        # 400 is another worker having created it first; only the creator backfills
+        res = await get_es().options(ignore_status=400).indices.create(
+            index=GLOBAL_LEADERBOARD_INDEX,
+            mappings={"properties": {
+                "user_id": {"type": "keyword"},
+                "username": {"type": "keyword"},
+                "xp": {"type": "long"},
+                "score": {"type": "double"},
+                "groups": {"type": "keyword", "index": False},
+                "awarded": {"type": "keyword", "index": False},
+            }},
+        )
+        if res.body.get("acknowledged"):
+            await rebuild_global_leaderboard()
+
 
 # --- Challenge ---
 async def save_challenge(challenge: Dict) -> str:
-    res = await es.index(
-        index=CHALLENGE_INDEX,
-        id=challenge["id"],
-        document=challenge
+    item = await bulk_writer.index(CHALLENGE_INDEX, challenge, id=challenge["id"])
+    _warm_challenge_meta(challenge)
+    return item["index"]["_id"]
+
+
+async def save_challenge_artifacts(challenge: Dict, breakdown: str, testcases: str) -> str:
+    """
+    Writes the challenge together with its Agent 2 breakdown and Agent 3
+    testcases through the bulk writer, so they share a _bulk request.
+    Testcases are normalised (and compressed if large) once, here.
+    """
+    challenge_id = challenge["id"]
+    testcase_doc = to_testcase_doc(challenge_id, testcases)
+    results = await asyncio.gather(
+        bulk_writer.index(CHALLENGE_INDEX, challenge, id=challenge_id),
+        bulk_writer.index(BREAKDOWN_INDEX, {"challenge_id": challenge_id, "breakdown": breakdown}, id=challenge_id),
+        bulk_writer.index(TESTCASE_INDEX, testcase_doc, id=challenge_id),
+        return_exceptions=True,
     )
-    return res["_id"]
+    failed = [str(result) for result in results if isinstance(result, Exception)]
+    if failed:
+        raise RuntimeError(f"Bulk save failed for challenge {challenge_id}: {failed}")
+    _warm_challenge_meta(challenge)
+    cache_testcases(challenge_id, testcase_doc)
+    return challenge_id
 
 
-async def get_challenge_by_id(challenge_id: str) -> Dict | None:
+def _warm_challenge_meta(challenge: Dict):
+    challenge_meta_cache.set(challenge["id"], {field: challenge.get(field) for field in CHALLENGE_META_FIELDS})
+
+
+async def get_challenge_meta(challenge_id: str) -> Dict | None:
+    """
+    group_id, difficulty and xp of a challenge, from the cache when possible.
+    Returns None if the challenge doesn't exist.
+    """
+    meta = challenge_meta_cache.get(challenge_id)
+    if meta is not None:
+        return meta
+    # Only the meta fields: the full document carries the problem statement
     try:
-        res = await es.get(index=CHALLENGE_INDEX, id=challenge_id)
-        return res["_source"]
+        res = await get_es().get(index=CHALLENGE_INDEX, id=challenge_id, source_includes=CHALLENGE_META_FIELDS)
     except NotFoundError:
         return None
+    meta = {field: res["_source"].get(field) for field in CHALLENGE_META_FIELDS}
+    challenge_meta_cache.set(challenge_id, meta)
+    return meta
+
+
+async def get_challenge_by_id(challenge_id: str) -> Dict | None:
+    return await load_doc(CHALLENGE_INDEX, challenge_id)
 
 
 async def get_challenges_by_group(group_id: str, size: int = 5) -> List[Dict]:
-    res = await es.search(
+    res = await get_es().search(
         index=CHALLENGE_INDEX,
         query={"term": {"group_id": group_id}},
         sort=[{"created_at": {"order": "desc"}}],
@@ -77,20 +136,17 @@ async def get_challenges_by_group(group_id: str, size: int = 5) -> List[Dict]:
 
 # --- Submissions ---
 async def save_submission(submission: Dict) -> str:
-    res = await es.index(index=SUBMISSION_INDEX, document=submission)
-    return res["_id"]
+    item = await bulk_writer.index(SUBMISSION_INDEX, submission)
+    return item["index"]["_id"]
 
 
 async def get_submission_by_id(submission_id: str) -> Dict | None:
-    try:
-        res = await es.get(index=SUBMISSION_INDEX, id=submission_id)
-        return res["_source"]
-    except NotFoundError:
-        return None
+    return await load_doc(SUBMISSION_INDEX, submission_id)
 
 
 # --- Leaderboard ---
 async def update_leaderboard_xp(
+    submission_id: str,
     user_id: str,
     challenge_id: str,
     xp_to_add: int,
@@ -98,24 +154,33 @@ async def update_leaderboard_xp(
     score: float,
     feedback: str
 ):
+    """
+    Awards a submission's XP on the user's group leaderboard row. The row
+    remembers which submissions it was awarded for, so evaluating the same
+    submission again (e.g. after an interrupted run) doesn't add XP twice.
+    """
     if not user_id:
         return
 
-    try:
-        challenge_doc = await es.get(index=CHALLENGE_INDEX, id=challenge_id)
-        group_id = challenge_doc["_source"].get("group_id")
-    except NotFoundError:
-        return
-
+    meta = await get_challenge_meta(challenge_id)
+    group_id = meta and meta["group_id"]
     if not group_id:
         return
 
     doc_id = f"{group_id}_{user_id}"
 
     script = {
-        "source": "ctx._source.xp += params.xp",
+        "source": """
+            if (ctx._source.awarded == null) { ctx._source.awarded = []; }
+            if (ctx._source.awarded.contains(params.submission_id)) {
+                ctx.op = 'noop';
+            } else {
+                ctx._source.xp += params.xp;
+                ctx._source.awarded.add(params.submission_id);
+            }
+        """,
         "lang": "painless",
-        "params": {"xp": xp_to_add}
+        "params": {"xp": xp_to_add, "submission_id": submission_id}
     }
 
     upsert_doc = {
@@ -125,30 +190,204 @@ async def update_leaderboard_xp(
         "xp": xp_to_add,
         "score": score,
         "feedback": feedback,
+        "awarded": [submission_id],
+    }
+
+    # The user's global totals are written alongside, in the same _bulk request
+    global_script = {
+        "source": """
+            if (ctx._source.awarded == null) { ctx._source.awarded = []; }
+            if (ctx._source.groups == null) { ctx._source.groups = []; }
+            if (ctx._source.awarded.contains(params.submission_id)) {
+                ctx.op = 'noop';
+            } else {
+                ctx._source.awarded.add(params.submission_id);
+                ctx._source.xp += params.xp;
+                ctx._source.username = params.username;
+                // A group row's score is set by its first award, so it counts once per group
+                if (!ctx._source.groups.contains(params.group_id)) {
+                    ctx._source.groups.add(params.group_id);
+                    ctx._source.score += params.score;
+                }
+            }
+        """,
+        "lang": "painless",
+        "params": {
+            "xp": xp_to_add,
+            "score": score,
+            "username": username,
+            "group_id": group_id,
+            "submission_id": submission_id,
+        }
+    }
+    global_upsert = {
+        "user_id": user_id,
+        "username": username,
+        "xp": xp_to_add,
+        "score": score,
+        "groups": [group_id],
+        "awarded": [submission_id],
     }
 
+    group_write = bulk_writer.update(LEADERBOARD_INDEX, doc_id, script=script, upsert=upsert_doc)
+    global_write = bulk_writer.update(GLOBAL_LEADERBOARD_INDEX, user_id, script=global_script, upsert=global_upsert)
+    try:
+        await global_write
+    except BulkWriteError as e:
+        print("[ERROR] Global leaderboard update failed:", e)
     try:
-        await es.update(
+        item = await group_write
+    except BulkWriteError as e:
+        print("[ERROR] Leaderboard update failed:", e)
+        return
+    if item["update"].get("result") == "noop":
+        print(f"⚠ XP for submission {submission_id} was already awarded")
+        return
+
+    rank_engine.record_xp(group_id, user_id, username, xp_to_add, score)
+    invalidate_leaderboard(group_id)
+
+
+async def rebuild_rank_engine():
+    """
+    Loads every leaderboard row into the in-memory rank engine.
+    """
+    if not await get_es().indices.exists(index=LEADERBOARD_INDEX):
+        rank_engine.load([])
+        return
+
+    docs = [
+        hit["_source"]
+        async for hit in helpers.async_scan(
+            get_es(),
             index=LEADERBOARD_INDEX,
-            id=doc_id,
-            script=script,
-            upsert=upsert_doc
+            query={"query": {"match_all": {}}, "_source": {"excludes": ["awarded", "feedback"]}},
         )
-    except RequestError as e:
-        print("[ERROR] Leaderboard update failed:", e)
+    ]
+    rank_engine.load(docs)
+    print(f"✅ Rank engine loaded {len(docs)} leaderboard rows")
+
+
+async def refresh_rank_engine():
+    """
+    Rebuilds the rank engine every RANK_ENGINE_REFRESH seconds until
+    cancelled. An award made during a rebuild may be missing until the next.
+    """
+    while True:
+        await asyncio.sleep(RANK_ENGINE_REFRESH)
+        try:
+            await rebuild_rank_engine()
+        except Exception as e:
+            print(f"[WARN] Could not refresh rank engine: {e}")
 
 
-async def get_leaderboard(group_id: str | None) -> List[dict]:
+# Same order as the rank engine; user_id makes it total so search_after never skips or repeats rows
+LEADERBOARD_SORT = [
+    {"score": {"order": "desc"}},
+    {"xp": {"order": "desc"}},
+    {"user_id": {"order": "asc"}},
+]
+LEADERBOARD_SORT_REVERSED = [
+    {"score": {"order": "asc"}},
+    {"xp": {"order": "asc"}},
+    {"user_id": {"order": "desc"}},
+]
+
+
+async def get_leaderboard(
+    group_id: str | None,
+    size: int = 100,
+    search_after: list | None = None,
+    reverse: bool = False,
+) -> List[dict]:
+    """
+    One page of leaderboard rows after `search_after`. With `reverse`, the
+    rows before it instead, nearest first.
+    """
     query = {"term": {"group_id": group_id}} if group_id else {"match_all": {}}
+    sort = LEADERBOARD_SORT_REVERSED if reverse else LEADERBOARD_SORT
 
     try:
-        res = await es.search(
+        res = await get_es().search(
             index=LEADERBOARD_INDEX,
             query=query,
-            size=100,
-            sort=[{"xp": {"order": "desc"}}]
+            size=size,
+            sort=sort,
+            search_after=search_after,
+            source_excludes=["awarded", "feedback"],
         )
         return [hit["_source"] for hit in res["hits"]["hits"]]
     except RequestError as e:
         print("[ERROR] Fetch leaderboard failed:", e)
         return []
+
+
+
+async def get_leaderboard_row(group_id: str, user_id: str) -> dict | None:
+    return await load_doc(LEADERBOARD_INDEX, f"{group_id}_{user_id}")
+
+
+async def count_leaderboard_ahead(row: dict) -> int:
+    """How many rows of the row's group sort before it."""
+    score, xp = row.get("score") or 0.0, row.get("xp") or 0
+    res = await get_es().count(index=LEADERBOARD_INDEX, query={"bool": {
+        "filter": [{"term": {"group_id": row["group_id"]}}],
+        "should": [
+            {"range": {"score": {"gt": score}}},
+            {"bool": {"filter": [{"term": {"score": score}}, {"range": {"xp": {"gt": xp}}}]}},
+            {"bool": {"filter": [
+                {"term": {"score": score}},
+                {"term": {"xp": xp}},
+                {"range": {"user_id": {"lt": row["user_id"]}}},
+            ]}},
+        ],
+        "minimum_should_match": 1,
+    }})
+    return res["count"]
+
+
+async def get_global_leaderboard(size: int = 50, search_after: list | None = None) -> List[dict]:
+    """
+    One page of users' totals over every group, in leaderboard order.
+    Errors propagate: an empty page must mean there is nobody left.
+    """
+    res = await get_es().search(
+        index=GLOBAL_LEADERBOARD_INDEX,
+        size=size,
+        sort=LEADERBOARD_SORT,
+        search_after=search_after,
+        source=["user_id", "username", "score", "xp"],
+    )
+    return [hit["_source"] for hit in res["hits"]["hits"]]
+
+
+async def _global_totals() -> List[dict]:
+    totals: Dict[str, dict] = {}
+    async for hit in helpers.async_scan(get_es(), index=LEADERBOARD_INDEX, query={"query": {"match_all": {}}}):
+        row = hit["_source"]
+        if not row.get("user_id") or not row.get("group_id"):
+            continue
+        total = totals.setdefault(row["user_id"], {
+            "user_id": row["user_id"], "username": row.get("username"), "xp": 0, "score": 0.0, "groups": [], "awarded": [],
+        })
+        total["xp"] += row.get("xp") or 0
+        total["score"] += row.get("score") or 0.0
+        total["groups"].append(row["group_id"])
+        total["awarded"].extend(row.get("awarded") or [])
+    return list(totals.values())
+
+
+async def rebuild_global_leaderboard():
+    """
+    Recomputes every user's global totals from the per-group rows. Runs
+    when init_indices() creates the global index; safe to re-run while no
+    XP is being awarded.
+    """
+    if not await get_es().indices.exists(index=LEADERBOARD_INDEX):
+        return
+    totals = await _global_totals()
+    await helpers.async_bulk(get_es(), (
+        {"_op_type": "index", "_index": GLOBAL_LEADERBOARD_INDEX, "_id": total["user_id"], "_source": total}
+        for total in totals
+    ))
+    print(f"✅ Global leaderboard rebuilt for {len(totals)} users")
@@ -0,0 +1,11 @@
+import asyncio
+
+
+def consume_exception(future: asyncio.Future):
+    """
+    Done callback for futures whose failures are handled elsewhere (logged,
+    or re-raised to whoever awaits them). Retrieving the exception stops
+    asyncio warning "exception was never retrieved" when nobody does.
+    """
+    if not future.cancelled():
+        future.exception()
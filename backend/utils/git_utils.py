@@ -1,8 +1,24 @@
-import subprocess
+import asyncio
+import hashlib
+import io
 import os
+import shutil
 import tempfile
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
 
+# --- Per-command timeouts (seconds) ---
+GIT_CLONE_TIMEOUT = float(os.getenv("GIT_CLONE_TIMEOUT", "120"))
+GIT_COMMAND_TIMEOUT = float(os.getenv("GIT_COMMAND_TIMEOUT", "60"))
+
+# Never block on a credential prompt for a private/missing repo
+GIT_ENV = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+
+# --- Bare mirror cache ---
+REPO_CACHE_DIR = os.getenv("REPO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "dojo-repo-cache"))
+REPO_CACHE_MAX_BYTES = int(os.getenv("REPO_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
 # --- List of common code file extensions to look for ---
 CODE_FILE_EXTENSIONS = [
     "*.py",      # Python
@@ -25,59 +41,301 @@ CODE_FILE_EXTENSIONS = [
     "*.kt",      # Kotlin
     "*.rs",      # Rust
 ]
+CODE_FILE_SUFFIXES = {pattern[1:] for pattern in CODE_FILE_EXTENSIONS}
+
+# Directories that never hold code worth evaluating
+EXCLUDED_DIRS = {
+    ".git", "node_modules", "__pycache__", ".venv", "venv", "env",
+    "dist", "build", "target", ".next", ".idea", ".vscode", "vendor",
+}
+
+# --- Source budgets (bytes) ---
+SOURCE_MAX_FILE_BYTES = int(os.getenv("SOURCE_MAX_FILE_BYTES", str(256 * 1024)))
+SOURCE_MAX_TOTAL_BYTES = int(os.getenv("SOURCE_MAX_TOTAL_BYTES", str(2 * 1024 * 1024)))
+BINARY_SNIFF_BYTES = 8192
+
+class GitCommandError(RuntimeError):
+    def __init__(self, args: tuple, returncode: int | None, stdout: str, stderr: str):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        super().__init__(
+            f"Git command failed: git {' '.join(args)}\n--- STDOUT ---\n{stdout}\n--- STDERR ---\n{stderr}"
+        )
+
 
-def get_code_from_repo(clone_url: str, commit_hash: str) -> str:
+async def run_git(*args: str, cwd: str | None = None, timeout: float = GIT_COMMAND_TIMEOUT, check: bool = True) -> str:
     """
-    Clones a Git repository to a temporary directory, checks out a specific commit,
-    and reads the content of all recognized coding files.
+    Runs a git command as an asyncio subprocess, so the event loop keeps
+    serving requests while it runs. The process is killed if it exceeds
+    `timeout` or if the calling task is cancelled.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        "git", *args,
+        cwd=cwd,
+        env=GIT_ENV,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise GitCommandError(args, None, "", f"Timed out after {timeout:.0f}s")
+    except asyncio.CancelledError:
+        proc.kill()
+        await proc.wait()
+        raise
 
-    Returns the concatenated content of all found files as a single string.
+    stdout = stdout.decode(errors="replace")
+    stderr = stderr.decode(errors="replace")
+    if check and proc.returncode != 0:
+        raise GitCommandError(args, proc.returncode, stdout, stderr)
+    return stdout
+
+
+def _is_binary(head: bytes) -> bool:
+    return b"\0" in head[:BINARY_SNIFF_BYTES]
+
+
+def iter_code_files(repo_dir: str):
+    """
+    Walks repo_dir once, in sorted order, and yields (relative path, content)
+    for each recognized code file. Excluded directories are pruned before
+    descending, binary files are skipped, and reads stop at the per-file and
+    total byte budgets.
+    """
+    remaining = SOURCE_MAX_TOTAL_BYTES
+
+    for dirpath, dirnames, filenames in os.walk(repo_dir):
+        # Pruning in place stops os.walk from descending into these at all
+        dirnames[:] = sorted(d for d in dirnames if d not in EXCLUDED_DIRS)
+
+        for filename in sorted(filenames):
+            if Path(filename).suffix.lower() not in CODE_FILE_SUFFIXES:
+                continue
+            if remaining <= 0:
+                print(f"⚠ Source budget of {SOURCE_MAX_TOTAL_BYTES} bytes reached, skipping remaining files.")
+                return
+
+            code_file = os.path.join(dirpath, filename)
+            budget = min(SOURCE_MAX_FILE_BYTES, remaining)
+            try:
+                with open(code_file, "rb") as f:
+                    raw = f.read(budget + 1)
+                if _is_binary(raw):
+                    continue
+                truncated = len(raw) > budget
+                content = raw[:budget].decode("utf-8", errors="ignore" if truncated else "strict")
+            except Exception as e:
+                print(f"⚠ Could not read file {code_file}: {e}")
+                continue
+
+            if truncated:
+                content += "\n# --- truncated ---\n"
+            remaining -= min(len(raw), budget)
+            yield os.path.relpath(code_file, repo_dir), content
+
+
+def read_code_files(repo_dir: str) -> str:
+    """
+    Builds the submission payload from the code files under repo_dir.
+    Blocking; run it in an executor from async code.
+    """
+    payload = io.StringIO()
+    for relative_path, content in iter_code_files(repo_dir):
+        if payload.tell():
+            payload.write("\n\n")
+        payload.write(f"# --- File: {relative_path} ---\n")
+        payload.write(content)
+
+    if not payload.tell():
+        raise ValueError("❌ No recognized code files found in the repository.")
+
+    return payload.getvalue()
+
+
+class RepoCache:
     """
-    with tempfile.TemporaryDirectory() as temp_dir:
-        print(f"Cloning {clone_url} into temporary directory {temp_dir}...")
+    On-disk cache of bare clones, one per clone URL.
 
+    A push only fetches the pushed commit into the existing mirror, and the
+    commit is checked out into a throwaway worktree. Each mirror has its own
+    lock so concurrent pushes to the same repo don't race on fetch/worktree
+    metadata, and the least recently used mirrors are evicted once the cache
+    grows past max_bytes.
+
+    Mirror sizes and last-used times are kept in memory: the cache directory
+    is scanned once, and after that only a mirror that was just cloned or
+    fetched into is measured again.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._in_use: dict[str, int] = {}
+        self._sizes: dict[str, int] = {}
+        self._last_used: dict[str, float] = {}
+        self._bytes = 0
+        self._scan: asyncio.Task | None = None
+        self._stats = {"hits": 0, "fetches": 0, "clones": 0, "evictions": 0}
+
+    def _key(self, clone_url: str) -> str:
+        return hashlib.sha256(clone_url.encode()).hexdigest()[:24]
+
+    def _lock(self, key: str) -> asyncio.Lock:
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+    def _mirror(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.git")
+
+    async def _ensure_commit(self, clone_url: str, mirror: str, commit_hash: str) -> bool:
+        """Returns True if the mirror had to be cloned or fetched into."""
+        if not os.path.isdir(mirror):
+            await asyncio.to_thread(os.makedirs, self.root, exist_ok=True)
+            await run_git("clone", "--bare", clone_url, mirror, timeout=GIT_CLONE_TIMEOUT)
+            self._stats["clones"] += 1
+
+        if await self._has_commit(mirror, commit_hash):
+            self._stats["hits"] += 1
+            return False
+
+        await run_git("fetch", "origin", commit_hash, cwd=mirror, timeout=GIT_CLONE_TIMEOUT)
+        self._stats["fetches"] += 1
+        return True
+
+    async def _has_commit(self, mirror: str, commit_hash: str) -> bool:
         try:
-            # --- Git Clone ---
-            # Using --depth 1 is efficient but requires fetching the specific commit later
-            subprocess.run(
-                ["git", "clone", "--depth", "1", clone_url, temp_dir], 
-                check=True, capture_output=True, text=True
-            )
-
-            # --- Git Fetch & Checkout ---
-            # Fetch the specific commit hash since a shallow clone might not include it
-            subprocess.run(
-                ["git", "fetch", "origin", commit_hash],
-                cwd=temp_dir, check=False, capture_output=True, text=True # Use check=False to ignore errors if commit is already present
-            )
-            
-            subprocess.run(
-                ["git", "checkout", commit_hash], 
-                cwd=temp_dir, check=True, capture_output=True, text=True
-            )
+            await run_git("cat-file", "-e", f"{commit_hash}^{{commit}}", cwd=mirror)
+            return True
+        except GitCommandError:
+            return False
+
+    @asynccontextmanager
+    async def checkout(self, clone_url: str, commit_hash: str):
+        """
+        Yields a directory with `commit_hash` checked out. The worktree is
+        removed again when the block exits.
+        """
+        key = self._key(clone_url)
+        mirror = self._mirror(key)
+        await self._load()
+        worktree = os.path.join(await asyncio.to_thread(tempfile.mkdtemp, prefix="dojo-"), "src")
 
+        self._in_use[key] = self._in_use.get(key, 0) + 1
+        try:
+            async with self._lock(key):
+                changed = await self._ensure_commit(clone_url, mirror, commit_hash)
+                if changed or key not in self._sizes:
+                    self._set_size(key, await asyncio.to_thread(_dir_size, mirror))
+                await run_git("worktree", "add", "--detach", worktree, commit_hash, cwd=mirror)
+                await asyncio.to_thread(os.utime, mirror)
+                self._last_used[key] = time.time()
             print(f"✅ Successfully checked out commit {commit_hash}.")
-        except subprocess.CalledProcessError as e:
-            # Provide a more detailed error message if a Git command fails
-            raise RuntimeError(f"Git command failed:\n--- STDOUT ---\n{e.stdout}\n--- STDERR ---\n{e.stderr}")
 
-        # --- Read File Contents ---
-        all_code = []
-        temp_path = Path(temp_dir)
-        
-        for extension in CODE_FILE_EXTENSIONS:
-            for code_file in temp_path.rglob(extension):
-                # Exclude files in .git directory
-                if ".git" in str(code_file):
+            try:
+                yield worktree
+            finally:
+                async with self._lock(key):
+                    await run_git("worktree", "remove", "--force", worktree, cwd=mirror, check=False)
+                    await run_git("worktree", "prune", cwd=mirror, check=False)
+        finally:
+            self._in_use[key] -= 1
+            if not self._in_use[key]:
+                del self._in_use[key]
+            await asyncio.to_thread(shutil.rmtree, os.path.dirname(worktree), True)
+            await self._evict()
+
+    # --- Bookkeeping ---
+    async def _load(self):
+        """Seeds sizes and last-used times from the mirrors already on disk, once."""
+        if self._scan is None:
+            self._scan = asyncio.create_task(asyncio.to_thread(self._scan_mirrors))
+        for key, last_used, size in await asyncio.shield(self._scan):
+            if key not in self._sizes:
+                self._set_size(key, size)
+                self._last_used.setdefault(key, last_used)
+
+    def _scan_mirrors(self) -> list[tuple[str, float, int]]:
+        """(key, last used, size in bytes) for every mirror on disk. Blocking."""
+        mirrors = []
+        if not os.path.isdir(self.root):
+            return mirrors
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith(".git") or not entry.is_dir():
+                continue
+            mirrors.append((entry.name[:-len(".git")], entry.stat().st_mtime, _dir_size(entry.path)))
+        return mirrors
+
+    def _set_size(self, key: str, size: int):
+        self._bytes += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+
+    async def _evict(self):
+        """
+        Deletes least recently used mirrors until the cache fits in max_bytes.
+        Victims are picked on the event loop while holding their lock, so a
+        checkout can't start on a mirror that is being deleted; only the
+        rmtree itself runs in a thread.
+        """
+        for key in sorted(self._sizes, key=lambda k: self._last_used.get(k, 0)):
+            if self._bytes <= self.max_bytes:
+                break
+            lock = self._lock(key)
+            # Never pull a mirror out from under a running checkout
+            if key in self._in_use or lock.locked():
+                continue
+            async with lock:
+                if key in self._in_use or key not in self._sizes:
                     continue
-                try:
-                    header = f"# --- File: {code_file.relative_to(temp_dir)} ---\n"
-                    content = code_file.read_text(encoding="utf-8")
-                    all_code.append(header + content)
-                except Exception as e:
-                    print(f"⚠ Could not read file {code_file}: {e}")
+                size = self._sizes.pop(key)
+                self._last_used.pop(key, None)
+                self._bytes -= size
+                await asyncio.to_thread(shutil.rmtree, self._mirror(key), True)
+            if key not in self._in_use and not lock.locked():
+                self._locks.pop(key, None)
+            self._stats["evictions"] += 1
+            print(f"🧹 Evicted cached repo {key} ({size} bytes)")
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "repos": len(self._sizes),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+def _dir_size(path: str) -> int:
+    """Total size of the files under path, in bytes. Blocking."""
+    size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                size += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return size
+
 
-        if not all_code:
-            raise ValueError("❌ No recognized code files found in the repository.")
+repo_cache = RepoCache(REPO_CACHE_DIR, REPO_CACHE_MAX_BYTES)
 
-        return "\n\n".join(all_code)
\ No newline at end of file
+
+async def get_code_from_repo(clone_url: str, commit_hash: str) -> str:
+    """
+    Checks out a specific commit from the local mirror cache (fetching only
+    what is missing) and reads the content of all recognized coding files.
+
+    Git runs as async subprocesses and file reading runs in a worker thread,
+    so several submissions can be processed at once without stalling the API.
+
+    Returns the concatenated content of all found files as a single string.
+    """
+    print(f"Checking out {clone_url} at {commit_hash} from repo cache...")
+    async with repo_cache.checkout(clone_url, commit_hash) as worktree:
+        # --- Read File Contents ---
+        return await asyncio.to_thread(read_code_files, worktree)
@@ -19,11 +19,19 @@ def initialize_all_indexes():
     })
 
     create_index("groups", {
+        "id": {"type": "text", "fields": {"keyword": {"type": "keyword"}}}, # id.keyword is the listing's pagination tiebreaker
         "name": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
         "description": {"type": "text"},
         "created_by": {"type": "keyword"},
         "created_at": {"type": "date"},
-        "members": {"type": "keyword"} # To store a list of user_ids
+        "members": {"type": "keyword"} # Legacy member list, moved to group_members by utils/migrate_memberships.py
+    })
+
+    # One document per (group_id, user_id) membership, see manager/group_manager_es.py
+    create_index("group_members", {
+        "group_id": {"type": "keyword"},
+        "user_id": {"type": "keyword"},
+        "joined_at": {"type": "date"}
     })
 
     create_index("challenges", {
@@ -35,6 +43,21 @@ def initialize_all_indexes():
         "problem_statement": {"type": "text"}
     })
 
+    # Async challenge-generation jobs, see services/challenge_jobs.py
+    create_index("challenge_jobs", {
+        "challenge_id": {"type": "keyword"},
+        "created_by": {"type": "keyword"},
+        "status": {"type": "keyword"},
+        "stages": {"type": "object"},
+        "challenge": {"type": "object", "enabled": False},
+        "outputs": {"type": "object", "enabled": False},
+        "error": {"type": "text", "index": False},
+        "created_at": {"type": "date"},
+        "updated_at": {"type": "date"},
+        "claimed_by": {"type": "keyword"}, # Worker lease, see utils/lease.py
+        "lease_until": {"type": "long"}
+    })
+
     # This index is for the Agent 2 breakdown output
     create_index("breakdowns", {
         "challenge_id": {"type": "keyword"},
@@ -45,7 +68,9 @@ def initialize_all_indexes():
     create_index("testcases", {
         "challenge_id": {"type": "keyword"},
         # Storing the (potentially large) string of test cases from Agent 3
-        "testcases": {"type": "text", "index": False} # 'index: False' saves space if you don't need to search this text
+        "testcases": {"type": "text", "index": False}, # 'index: False' saves space if you don't need to search this text
+        "format": {"type": "keyword"}, # json | text, set once the suite is normalised
+        "testcases_zlib": {"type": "binary"} # large suites, see utils/testcase_format.py
     })
 
     create_index("submissions", {
@@ -55,14 +80,35 @@ def initialize_all_indexes():
         "status": {"type": "keyword"},
         "score": {"type": "float"},
         "feedback": {"type": "text", "index": False},
-        "submitted_at": {"type": "date"}
+        "submitted_at": {"type": "date"},
+        "claimed_by": {"type": "keyword"}, # Worker lease, see utils/lease.py
+        "lease_until": {"type": "long"}
+    })
+
+    # Agent 4 verdicts keyed by hash(source, testcases), see manager/evaluation_cache.py
+    create_index("evaluation_cache", {
+        "score": {"type": "float"},
+        "feedback": {"type": "text", "index": False},
+        "created_at": {"type": "date"}
     })
 
     create_index("leaderboard", {
         "user_id": {"type": "keyword"},
         "username": {"type": "keyword"},
         "group_id": {"type": "keyword"},
-        "xp": {"type": "float"}
+        "score": {"type": "float"},
+        "xp": {"type": "float"},
+        "awarded": {"type": "keyword", "index": False} # Submission IDs already awarded, see update_leaderboard_xp
+    })
+
+    # Per-user totals over every group, for the global leaderboard; see utils/es_utils.py
+    create_index("leaderboard_global", {
+        "user_id": {"type": "keyword"},
+        "username": {"type": "keyword"},
+        "xp": {"type": "long"},
+        "score": {"type": "double"},
+        "groups": {"type": "keyword", "index": False},
+        "awarded": {"type": "keyword", "index": False}
     })
 
 if __name__ == "__main__":
@@ -0,0 +1,44 @@
+import time
+from collections import deque
+
+
+class LatencyTracker:
+    """
+    Keeps the last `window` durations of one code path and reports
+    percentiles against a latency budget. Meant for /metrics, not for
+    long-term storage.
+    """
+
+    def __init__(self, name: str, budget_ms: float, window: int = 1024):
+        self.name = name
+        self.budget_ms = budget_ms
+        self._samples: deque[float] = deque(maxlen=window)
+        self._count = 0
+        self._over_budget = 0
+
+    def record(self, started_at: float) -> float:
+        """Records the time since `started_at` (a perf_counter reading) and returns it in ms."""
+        elapsed_ms = (time.perf_counter() - started_at) * 1000
+        self._samples.append(elapsed_ms)
+        self._count += 1
+        if elapsed_ms > self.budget_ms:
+            self._over_budget += 1
+            print(f"[WARN] {self.name} took {elapsed_ms:.0f}ms (budget {self.budget_ms:.0f}ms)")
+        return elapsed_ms
+
+    def _percentile(self, ordered: list[float], p: float) -> float:
+        if not ordered:
+            return 0.0
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 2)
+
+    def stats(self) -> dict:
+        ordered = sorted(self._samples)
+        return {
+            "count": self._count,
+            "budget_ms": self.budget_ms,
+            "over_budget": self._over_budget,
+            "p50_ms": self._percentile(ordered, 0.50),
+            "p95_ms": self._percentile(ordered, 0.95),
+            "p99_ms": self._percentile(ordered, 0.99),
+            "max_ms": round(ordered[-1], 2) if ordered else 0.0,
+        }
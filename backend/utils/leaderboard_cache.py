@@ -0,0 +1,32 @@
+import os
+import hashlib
+from utils.cache import TTLCache
+
+LEADERBOARD_CACHE_SIZE = int(os.getenv("LEADERBOARD_CACHE_SIZE", "512"))
+# Upper bound on staleness for changes this process didn't see (other workers, the ES fallback)
+LEADERBOARD_CACHE_TTL = float(os.getenv("LEADERBOARD_CACHE_TTL", "30"))
+
+GLOBAL_SCOPE = "__global__"
+
+# (scope, size, cursor) -> {"scope", "etag", "body"}
+leaderboard_cache = TTLCache(maxsize=LEADERBOARD_CACHE_SIZE, ttl=LEADERBOARD_CACHE_TTL)
+
+
+def make_etag(body: bytes) -> str:
+    """A content hash, so a rebuilt payload with the same rows keeps its ETag."""
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def get_cached_payload(scope: str, size: int, cursor: str | None) -> dict | None:
+    return leaderboard_cache.get((scope, size, cursor))
+
+
+def cache_payload(scope: str, size: int, cursor: str | None, body: bytes) -> dict:
+    payload = {"scope": scope, "etag": make_etag(body), "body": body}
+    leaderboard_cache.set((scope, size, cursor), payload)
+    return payload
+
+
+def invalidate_leaderboard(group_id: str):
+    """Drops every cached page of the group's board, and of the global board it feeds into."""
+    leaderboard_cache.pop_where(lambda payload: payload["scope"] in (group_id, GLOBAL_SCOPE))
@@ -0,0 +1,120 @@
+import os
+import time
+import socket
+import asyncio
+from uuid import uuid4
+from elasticsearch import ConflictError, NotFoundError
+from search.connection import get_es
+
+# A claimed document belongs to this process until `lease_until`; the owner
+# renews it while the work is queued or running, so only a dead worker's
+# claims expire and get picked up by another worker's startup sweep.
+LEASE_SECONDS = float(os.getenv("LEASE_SECONDS", "300"))
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:8]}"
+
+# index -> IDs this process holds a lease on
+_held: dict[str, set[str]] = {}
+
+_CLAIM_SCRIPT = """
+if (!params.states.contains(ctx._source[params.status_field])) {
+    ctx.op = 'noop';
+} else if (ctx._source.claimed_by != null && ctx._source.claimed_by != params.owner
+        && ctx._source.lease_until != null && ctx._source.lease_until > params.now) {
+    ctx.op = 'noop';
+} else {
+    ctx._source.claimed_by = params.owner;
+    ctx._source.lease_until = params.until;
+}
+"""
+
+_RENEW_SCRIPT = """
+if (ctx._source.claimed_by == params.owner) {
+    ctx._source.lease_until = params.until;
+} else {
+    ctx.op = 'noop';
+}
+"""
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def lease_fields() -> dict:
+    """Claim fields for a document this process creates and works on itself."""
+    return {"claimed_by": WORKER_ID, "lease_until": _now_ms() + int(LEASE_SECONDS * 1000)}
+
+
+def hold(index: str, doc_id: str):
+    """Keeps the lease on a document created with lease_fields() renewed."""
+    _held.setdefault(index, set()).add(doc_id)
+
+
+def release(index: str, doc_id: str):
+    """Stops renewing the lease; call once the document left its claimable states."""
+    _held.get(index, set()).discard(doc_id)
+
+
+def expired_lease_query() -> dict:
+    """Matches documents whose lease has lapsed or that were never claimed."""
+    return {"bool": {"must_not": [{"range": {"lease_until": {"gt": _now_ms()}}}]}}
+
+
+async def claim(index: str, doc_id: str, status_field: str, states: list[str]) -> bool:
+    """
+    Atomically takes the lease on a document whose `status_field` is one of
+    `states`, unless another live worker holds it. Re-claiming a document
+    this process already holds renews the lease. Returns True if this
+    process now owns the document.
+    """
+    now = _now_ms()
+    try:
+        res = await get_es().update(index=index, id=doc_id, script={
+            "source": _CLAIM_SCRIPT,
+            "lang": "painless",
+            "params": {
+                "status_field": status_field,
+                "states": states,
+                "owner": WORKER_ID,
+                "now": now,
+                "until": now + int(LEASE_SECONDS * 1000),
+            },
+        })
+    except (ConflictError, NotFoundError):
+        # Someone else changed it between our read and write, or it's gone
+        return False
+    if res["result"] != "updated":
+        return False
+    hold(index, doc_id)
+    return True
+
+
+async def _set_held_leases(until: int):
+    for index, ids in list(_held.items()):
+        if not ids:
+            continue
+        try:
+            await get_es().update_by_query(
+                index=index,
+                query={"ids": {"values": list(ids)}},
+                script={"source": _RENEW_SCRIPT, "lang": "painless", "params": {"owner": WORKER_ID, "until": until}},
+                conflicts="proceed",
+            )
+        except Exception as e:
+            print(f"[WARN] Could not update leases on {index}: {e}")
+
+
+async def renew_leases():
+    """
+    Extends every lease this process holds, every third of LEASE_SECONDS,
+    until cancelled. Run from the app lifespan.
+    """
+    while True:
+        await asyncio.sleep(LEASE_SECONDS / 3)
+        await _set_held_leases(_now_ms() + int(LEASE_SECONDS * 1000))
+
+
+async def release_held_leases():
+    """On shutdown: lets the next sweep take over unfinished work right away."""
+    await _set_held_leases(0)
+    _held.clear()
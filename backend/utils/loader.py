@@ -0,0 +1,117 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from search.connection import get_es
+from utils.futures import consume_exception
+
+LOADER_MAX_BATCH = 1000
+
+# index -> BatchLoader for the current request (or job), see loader_scope()
+_scope: ContextVar[dict | None] = ContextVar("loader_scope", default=None)
+
+
+class BatchLoader:
+    """
+    DataLoader-style point lookups on one index. Every load() issued in the
+    same event-loop tick is sent as a single mget, and each ID is fetched at
+    most once per loader, so concurrent and repeated lookups share a request.
+    """
+
+    def __init__(self, index: str):
+        self.index = index
+        self._memo: dict[str, asyncio.Future] = {}
+        self._queue: list[tuple[str, asyncio.Future]] = []
+        self._tasks: set[asyncio.Task] = set()
+
+    def load(self, doc_id: str) -> asyncio.Future:
+        """
+        Resolves to the document's _source, or None if it doesn't exist.
+        Each caller gets a shield over the shared future, so one caller
+        being cancelled doesn't cancel the lookup for the others.
+        """
+        future = self._memo.get(doc_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            future.add_done_callback(consume_exception)
+            self._memo[doc_id] = future
+            self._queue.append((doc_id, future))
+            if len(self._queue) == 1:
+                loop.call_soon(self._dispatch)
+        return asyncio.shield(future)
+
+    def forget(self, doc_id: str):
+        """Drops a memoised document, e.g. after writing to it."""
+        self._memo.pop(doc_id, None)
+
+    def _dispatch(self):
+        # The batch carries its own futures: forget() may drop them from the memo mid-flight
+        batch, self._queue = self._queue, []
+        for start in range(0, len(batch), LOADER_MAX_BATCH):
+            task = asyncio.create_task(self._fetch(batch[start:start + LOADER_MAX_BATCH]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, batch: list[tuple[str, asyncio.Future]]):
+        try:
+            res = await get_es().mget(index=self.index, ids=[doc_id for doc_id, _ in batch])
+        except Exception as e:
+            for doc_id, future in batch:
+                self._fail(doc_id, future, e)
+            return
+
+        # mget answers in request order
+        for (doc_id, future), doc in zip(batch, res["docs"]):
+            if future.done():
+                continue
+            error = doc.get("error")
+            if error and error.get("type") != "index_not_found_exception":
+                self._fail(doc_id, future, RuntimeError(f"mget {self.index}/{doc_id} failed: {error}"))
+            else:
+                future.set_result(doc["_source"] if doc.get("found") else None)
+
+    def _fail(self, doc_id: str, future: asyncio.Future, error: Exception):
+        # Failures aren't memoised, so a later load in the same scope retries
+        if self._memo.get(doc_id) is future:
+            del self._memo[doc_id]
+        if not future.done():
+            future.set_exception(error)
+
+
+@contextmanager
+def loader_scope():
+    """
+    Gives the enclosed code (and tasks it starts) its own set of loaders.
+    Used per HTTP request by the middleware in main.py, and by background
+    jobs that fan out lookups.
+    """
+    token = _scope.set({})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def get_loader(index: str) -> BatchLoader:
+    """
+    The scope's loader for `index`. Outside a scope every call gets a fresh
+    loader, so lookups still work but are neither batched nor memoised.
+    """
+    loaders = _scope.get()
+    if loaders is None:
+        return BatchLoader(index)
+    if index not in loaders:
+        loaders[index] = BatchLoader(index)
+    return loaders[index]
+
+
+async def load_doc(index: str, doc_id: str) -> dict | None:
+    """A copy of the document's _source, so callers can't change the memoised one."""
+    source = await get_loader(index).load(doc_id)
+    return dict(source) if source is not None else None
+
+
+def forget_doc(index: str, doc_id: str):
+    loaders = _scope.get()
+    if loaders and index in loaders:
+        loaders[index].forget(doc_id)
@@ -0,0 +1,74 @@
+"""
+One-off migration: copies each group's legacy `members` array into the
+group_members index, then drops the array from the group document.
+
+Safe to re-run; memberships that already exist are left alone.
+
+    python -m utils.migrate_memberships
+"""
+import asyncio
+from datetime import datetime
+from elasticsearch import helpers
+from search.connection import get_es, close_es
+from manager.group_manager_es import GROUP_INDEX, MEMBERSHIP_INDEX, membership_id, ensure_membership_index
+
+
+async def _membership_actions(migrated_groups: list[str]):
+    async for hit in helpers.async_scan(
+        get_es(),
+        index=GROUP_INDEX,
+        query={"query": {"exists": {"field": "members"}}, "_source": ["members", "created_at"]},
+    ):
+        group_id = hit["_id"]
+        joined_at = hit["_source"].get("created_at") or datetime.utcnow().isoformat()
+        for user_id in set(hit["_source"].get("members") or []):
+            yield {
+                "_op_type": "create",
+                "_index": MEMBERSHIP_INDEX,
+                "_id": membership_id(group_id, user_id),
+                "_source": {"group_id": group_id, "user_id": user_id, "joined_at": joined_at},
+            }
+        migrated_groups.append(group_id)
+
+
+async def migrate_memberships():
+    await ensure_membership_index()
+    migrated_groups: list[str] = []
+    created, errors = 0, 0
+    async for ok, item in helpers.async_streaming_bulk(
+        get_es(), _membership_actions(migrated_groups), raise_on_error=False
+    ):
+        if ok:
+            created += 1
+        elif item["create"].get("status") != 409:  # 409: already migrated
+            errors += 1
+            print(f"❌ {item['create'].get('_id')}: {item['create'].get('error')}")
+
+    if errors:
+        print(f"[WARN] {errors} memberships failed; member arrays are kept, re-run to retry.")
+        return
+
+    async for ok, item in helpers.async_streaming_bulk(get_es(), (
+        {
+            "_op_type": "update",
+            "_index": GROUP_INDEX,
+            "_id": group_id,
+            "script": {"source": "ctx._source.remove('members')", "lang": "painless"},
+        }
+        for group_id in migrated_groups
+    ), raise_on_error=False):
+        if not ok:
+            print(f"❌ Could not drop members from {item['update'].get('_id')}: {item['update'].get('error')}")
+
+    print(f"[OK] Migrated {len(migrated_groups)} groups, {created} new memberships")
+
+
+async def main():
+    try:
+        await migrate_memberships()
+    finally:
+        await close_es()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,8 +1,16 @@
+import os
+import asyncio
 import secrets
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so a thread pool gives real parallelism; its size caps concurrent hashes
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -11,10 +19,34 @@ def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 
+# --- Async variants: keep bcrypt off the event loop ---
+async def _run_in_hash_pool(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, func, *args)
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_hash_pool(hash_password, password)
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await _run_in_hash_pool(verify_password, plain, hashed)
+
+async def verify_and_rehash_async(plain: str, hashed: str) -> tuple[bool, str | None]:
+    """
+    Verifies a password and, if the stored hash uses outdated settings
+    (e.g. a lower BCRYPT_ROUNDS), returns a fresh hash to store.
+    Returns (is_valid, new_hash_or_None).
+    """
+    if not hashed or not await verify_password_async(plain, hashed):
+        return False, None
+    if pwd_context.needs_update(hashed):
+        return True, await hash_password_async(plain)
+    return True, None
+
+
 def generate_reset_token():
     token = secrets.token_urlsafe(32)
     token_hash = hashlib.sha256(token.encode()).hexdigest()
     return token, token_hash
 
 def hash_reset_token(token: str):
-    return hashlib.sha256(token.encode()).hexdigest()
\ No newline at end of file
+    return hashlib.sha256(token.encode()).hexdigest()
@@ -0,0 +1,132 @@
+from sortedcontainers import SortedList
+
+
+class GroupRanking:
+    """
+    Members of one group kept sorted by (score desc, xp desc, user_id).
+    Updates and lookups are O(log n) on the SortedList of keys.
+    """
+
+    def __init__(self):
+        self._keys = SortedList()
+        self._entries: dict[str, dict] = {}
+
+    @staticmethod
+    def _key(entry: dict) -> tuple:
+        return (-entry["score"], -entry["xp"], entry["user_id"])
+
+    def upsert(self, entry: dict):
+        old = self._entries.get(entry["user_id"])
+        if old is not None:
+            self._keys.remove(self._key(old))
+        self._entries[entry["user_id"]] = entry
+        self._keys.add(self._key(entry))
+
+    def get(self, user_id: str) -> dict | None:
+        return self._entries.get(user_id)
+
+    def _ranked(self, start: int, stop: int) -> list[dict]:
+        return [
+            {**self._entries[key[-1]], "rank": start + offset + 1}
+            for offset, key in enumerate(self._keys.islice(start, stop))
+        ]
+
+    def page(self, k: int, after: list | None = None) -> list[dict]:
+        """
+        The k entries that sort after the cursor values [score, xp, user_id]
+        of the previous page's last entry.
+        """
+        start = 0
+        if after:
+            score, xp, user_id = after
+            start = self._keys.bisect_right((-score, -xp, user_id))
+        return self._ranked(start, start + k)
+
+    def index_of(self, user_id: str) -> int | None:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        return self._keys.bisect_left(self._key(entry))
+
+    def around(self, user_id: str, radius: int) -> list[dict]:
+        index = self.index_of(user_id)
+        if index is None:
+            return []
+        return self._ranked(max(0, index - radius), index + radius + 1)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class RankEngine:
+    """
+    In-memory group leaderboards, rebuilt from the leaderboard index on
+    startup and updated in place on every XP award. Each worker process
+    holds its own copy and only sees the awards it made itself, so with
+    several workers the copies are re-synced every RANK_ENGINE_REFRESH
+    seconds (see utils/es_utils.py).
+    """
+
+    def __init__(self):
+        self._groups: dict[str, GroupRanking] = {}
+        self.ready = False
+
+    def _group(self, group_id: str) -> GroupRanking:
+        if group_id not in self._groups:
+            self._groups[group_id] = GroupRanking()
+        return self._groups[group_id]
+
+    def load(self, docs: list[dict]):
+        """Replaces the engine's state with the given leaderboard documents."""
+        self._groups = {}
+        for doc in docs:
+            self.upsert(doc)
+        self.ready = True
+
+    def upsert(self, doc: dict):
+        if not doc.get("group_id") or not doc.get("user_id"):
+            return
+        ranking = self._group(doc["group_id"])
+        entry = {
+            "user_id": doc["user_id"],
+            "group_id": doc["group_id"],
+            "username": doc.get("username") or "Unknown",
+            "score": float(doc.get("score") or 0.0),
+            "xp": doc.get("xp") or 0,
+        }
+        ranking.upsert(entry)
+
+    def record_xp(self, group_id: str, user_id: str, username: str, xp_to_add: int, score: float):
+        """
+        Mirrors update_leaderboard_xp: an existing row gains XP, a new row
+        starts with the given XP and score.
+        """
+        current = self._group(group_id).get(user_id)
+        if current is None:
+            self.upsert({"group_id": group_id, "user_id": user_id, "username": username, "xp": xp_to_add, "score": score})
+        else:
+            self.upsert({**current, "xp": current["xp"] + xp_to_add})
+
+    def page(self, group_id: str, k: int, after: list | None = None) -> list[dict]:
+        return self._groups[group_id].page(k, after) if group_id in self._groups else []
+
+    def rank_of(self, group_id: str, user_id: str) -> dict | None:
+        ranking = self._groups.get(group_id)
+        index = ranking.index_of(user_id) if ranking else None
+        if index is None:
+            return None
+        return {**ranking.get(user_id), "rank": index + 1}
+
+    def around(self, group_id: str, user_id: str, radius: int) -> list[dict]:
+        ranking = self._groups.get(group_id)
+        return ranking.around(user_id, radius) if ranking else []
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "groups": len(self._groups),
+            "entries": sum(len(g) for g in self._groups.values()),
+        }
+
+
+rank_engine = RankEngine()
@@ -0,0 +1,59 @@
+import os
+import re
+import json
+import zlib
+import base64
+from typing import Any
+
+# Suites whose normalised text is larger than this are stored zlib-compressed
+TESTCASE_COMPRESS_THRESHOLD = int(os.getenv("TESTCASE_COMPRESS_THRESHOLD", str(64 * 1024)))
+
+_FENCE = re.compile(r"^```[a-zA-Z]*\s*\n(.*?)\n?```$", re.DOTALL)
+
+
+def normalise_testcases(raw: str | None) -> tuple[str, Any]:
+    """
+    Agent 3 output -> (text, parsed). JSON suites (fenced or not) are
+    re-serialised compactly and parsed; anything else is kept as
+    stripped text and "parsed" is that same text.
+    """
+    text = (raw or "").strip()
+    fenced = _FENCE.match(text)
+    if fenced:
+        text = fenced.group(1).strip()
+    try:
+        parsed = json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return text, text
+    return json.dumps(parsed, ensure_ascii=False, separators=(",", ":")), parsed
+
+
+def to_testcase_doc(challenge_id: str, raw: str | None) -> dict:
+    """The document stored in the testcases index."""
+    text, parsed = normalise_testcases(raw)
+    doc = {
+        "challenge_id": challenge_id,
+        "format": "text" if parsed is text else "json",
+    }
+    encoded = text.encode()
+    if len(encoded) > TESTCASE_COMPRESS_THRESHOLD:
+        doc["testcases_zlib"] = base64.b64encode(zlib.compress(encoded)).decode()
+    else:
+        doc["testcases"] = text
+    return doc
+
+
+def from_testcase_doc(source: dict) -> tuple[str, Any]:
+    """
+    Inverse of to_testcase_doc. Documents written before normalisation
+    only have the raw 'testcases' string, so they are normalised here.
+    """
+    if "testcases_zlib" in source:
+        text = zlib.decompress(base64.b64decode(source["testcases_zlib"])).decode()
+    else:
+        text = source.get("testcases") or ""
+    if source.get("format") == "json":
+        return text, json.loads(text)
+    if source.get("format") == "text":
+        return text, text
+    return normalise_testcases(text)
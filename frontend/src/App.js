@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import * as Yup from 'yup';
 import { ToastContainer, toast } from "react-toastify";
 import 'react-toastify/dist/ReactToastify.css';
@@ -47,12 +47,15 @@ const api = {
     register: (username, email, password, github_username) => api.request('/auth/register', { body: { username, email, password, github_username } }),
     getMe: () => api.request('/auth/me'),
     updateMe: (github_username) => api.request('/auth/me', { method: 'PUT', body: { github_username } }),
-    getGroups: () => api.request('/groups/'),
+    getGroups: (cursor) => api.request(`/groups/?exclude_mine=true${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`),
+    getMyGroups: () => api.request('/groups/mine'),
     getGroup: (groupId) => api.request(`/groups/${groupId}`),
+    getGroupDashboard: (groupId) => api.request(`/groups/${groupId}/dashboard`),
     createGroup: (name, description) => api.request('/groups/', { body: { name, description } }),
     joinGroup: (groupId) => api.request(`/groups/${groupId}/join`, { method: 'POST', body: {} }),
     getGroupLeaderboard: (groupId) => api.request(`/leaderboard/group/${groupId}`),
     createChallenge: (Topic, difficulty, group_id) => api.request('/challenges/', { body: { Topic, difficulty, group_id } }),
+    getChallengeJob: (jobId) => api.request(`/challenges/jobs/${jobId}`),
     getChallengeHistory: (groupId) => api.request(`/challenges/group/${groupId}`),
     getMySubmissions: () => api.request('/submissions/'),
     forgotPassword: (email) =>
@@ -271,18 +274,12 @@ function GroupProfilePage({ navigateTo, groupId, user }) {
     const fetchData = useCallback(async () => {
         setError(null);
         try {
-            const [groupData, leaderboardData, historyData, submissionsData] =
-                await Promise.all([
-                    api.getGroup(groupId),
-                    api.getGroupLeaderboard(groupId),
-                    api.getChallengeHistory(groupId),
-                    api.getMySubmissions()
-                ]);
-
-            setGroup(groupData);
-            setLeaderboard(leaderboardData || []);
-            setChallengeHistory(historyData || []);
-            setSubmissions(submissionsData || []);
+            const dashboard = await api.getGroupDashboard(groupId);
+
+            setGroup(dashboard.group);
+            setLeaderboard(dashboard.leaderboard || []);
+            setChallengeHistory(dashboard.challenges || []);
+            setSubmissions(dashboard.submissions || []);
         } catch (err) {
             setError(err.message || "Failed to load group data");
         } finally {
@@ -312,10 +309,6 @@ function GroupProfilePage({ navigateTo, groupId, user }) {
     if (error) return <ErrorMessage message={error} onRetry={fetchData} />;
     if (!group) return <ErrorMessage message="Group not found." />;
 
-    const userSubmissionsForGroup = submissions.filter(sub =>
-        challengeHistory.some(ch => ch.id === sub.challenge_id)
-    );
-
     return (
         <div className="max-w-4xl mx-auto px-4 py-12">
             <button onClick={() => navigateTo("dashboard")} className="flex items-center text-indigo-400 hover:text-indigo-300 mb-6"><ArrowLeftIcon className="w-5 h-5 mr-2" /> Back to All Groups</button>
@@ -329,7 +322,7 @@ function GroupProfilePage({ navigateTo, groupId, user }) {
             </div>
 
             {showChallengeForm && <CreateChallengeModal groupId={groupId} onClose={() => setShowChallengeForm(false)} onSuccess={fetchData} />}
-            {showFeedbackModal && <FeedbackModal submissions={userSubmissionsForGroup} onClose={() => setShowFeedbackModal(false)} />}
+            {showFeedbackModal && <FeedbackModal submissions={submissions} onClose={() => setShowFeedbackModal(false)} />}
 
             <div className="mt-10 grid grid-cols-1 md:grid-cols-2 gap-10">
                 <div>
@@ -373,7 +366,9 @@ function GroupProfilePage({ navigateTo, groupId, user }) {
 }
 
 function Dashboard({ user, handleLogout, navigateTo }) {
-    const [allGroups, setAllGroups] = useState([]);
+    const [myGroups, setMyGroups] = useState([]);
+    const [otherGroups, setOtherGroups] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [showCreateModal, setShowCreateModal] = useState(false);
@@ -381,17 +376,26 @@ function Dashboard({ user, handleLogout, navigateTo }) {
     async function fetchGroups() {
         setLoading(true); setError(null);
         try {
-            const groups = await api.getGroups();
-            setAllGroups(groups);
+            const [mine, page] = await Promise.all([api.getMyGroups(), api.getGroups()]);
+            setMyGroups(mine);
+            setOtherGroups(page.groups);
+            setNextCursor(page.next_cursor);
         } catch (err) {
             setError(err.message);
         } finally { setLoading(false); }
     }
 
-    useEffect(() => { fetchGroups(); }, []);
+    async function loadMoreGroups() {
+        try {
+            const page = await api.getGroups(nextCursor);
+            setOtherGroups(groups => [...groups, ...page.groups]);
+            setNextCursor(page.next_cursor);
+        } catch (err) {
+            toast.error(err.message || "Could not load more groups");
+        }
+    }
 
-    const myGroups = allGroups.filter(g => (g.members || []).includes(user.id));
-    const otherGroups = allGroups.filter(g => !myGroups.some(myG => myG.id === g.id));
+    useEffect(() => { fetchGroups(); }, []);
 
     return (
         <div className="max-w-7xl mx-auto px-4 py-12">
@@ -420,6 +424,7 @@ function Dashboard({ user, handleLogout, navigateTo }) {
                         {otherGroups.length === 0 ? (<p className="text-gray-400">No other groups available to join.</p>) : (
                             <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-6">{otherGroups.map(group => (<GroupCard key={group.id} group={group} isJoined={false} fetchGroups={fetchGroups} />))}</div>
                         )}
+                        {nextCursor && <div className="mt-6 text-center"><Button onClick={loadMoreGroups}>Load more groups</Button></div>}
                     </section>
                 </>
             )}
@@ -447,7 +452,7 @@ function GroupCard({ group, onClick, isJoined, fetchGroups }) {
             <p className="text-gray-400 mb-1 h-10 overflow-hidden">{group.description}</p>
             <p className="text-gray-500 text-xs mb-2">ID: {group.id}</p>
             <div className="flex items-center justify-between border-t border-gray-700 pt-3 text-sm text-gray-300">
-                <span className="flex items-center"><UsersIcon className="w-4 h-4 mr-1" /> {group.members?.length || 0} Members</span>
+                <span className="flex items-center"><UsersIcon className="w-4 h-4 mr-1" /> {group.member_count || 0} Members</span>
                 {!isJoined && <Button onClick={handleJoinClick} isLoading={loading} disabled={loading}>Join</Button>}
             </div>
         </div>
@@ -499,23 +504,59 @@ function CreateGroupModal({ onClose, onSuccess }) {
     );
 }
 
+const JOB_POLL_INTERVAL_MS = 3000;
+const JOB_POLL_TIMEOUT_MS = 10 * 60 * 1000;
+
+// Polls a challenge-generation job until it completes or fails, gives up after
+// JOB_POLL_TIMEOUT_MS, and stops quietly (resolving null) once isCancelled() is true.
+async function waitForChallengeJob(jobId, onProgress, isCancelled = () => false) {
+    const deadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+    while (!isCancelled()) {
+        const job = await api.getChallengeJob(jobId);
+        if (isCancelled()) break;
+        onProgress(job);
+        if (job.status === 'completed') return job;
+        if (job.status === 'failed') throw new Error(job.error || 'Challenge generation failed');
+        if (Date.now() >= deadline) {
+            throw new Error('Challenge generation is taking longer than expected. Check back later.');
+        }
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+    return null;
+}
+
 function CreateChallengeModal({ groupId, onClose, onSuccess }) {
     const [Topic, setTopic] = useState("");
     const [difficulty, setDifficulty] = useState("Easy");
     const [loading, setLoading] = useState(false);
+    const [progress, setProgress] = useState("");
+    const cancelled = useRef(false);
+
+    // Stop polling (and touching state) once the modal is gone
+    useEffect(() => {
+        cancelled.current = false;
+        return () => { cancelled.current = true; };
+    }, []);
 
     async function handleSubmit(e) {
         e.preventDefault();
         try {
             await createChallengeSchema.validate({ Topic, difficulty });
             setLoading(true);
-            await api.createChallenge(Topic, difficulty, groupId);
+            const job = await api.createChallenge(Topic, difficulty, groupId);
+            const done = await waitForChallengeJob(job.id, (current) => {
+                const running = Object.entries(current.stages || {}).filter(([, state]) => state === 'running').map(([stage]) => stage);
+                setProgress(running.length ? `Generating: ${running.join(', ')}` : `Status: ${current.status}`);
+            }, () => cancelled.current);
+            if (!done) return;
             toast.success("Challenge created! Members will be notified shortly.");
             onSuccess();
             onClose();
         } catch (err) {
-            toast.error(err.message || "Failed to create challenge");
-        } finally { setLoading(false); }
+            if (!cancelled.current) toast.error(err.message || "Failed to create challenge");
+        } finally {
+            if (!cancelled.current) { setLoading(false); setProgress(""); }
+        }
     }
 
     return (
@@ -535,6 +576,7 @@ function CreateChallengeModal({ groupId, onClose, onSuccess }) {
                             <option>Hard</option>
                         </select>
                     </div>
+                    {progress && <p className="text-sm text-gray-400">{progress}</p>}
                     <div className="flex justify-end gap-4 pt-4">
                         <Button type="button" onClick={onClose} variant="secondary">Cancel</Button>
                         <Button type="submit" isLoading={loading}>Create</Button>
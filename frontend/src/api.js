@@ -70,8 +70,11 @@ const api = {
     api.request('/auth/me', { method: 'PUT', body: { github_username } }),
 
   // --- Groups ---
-  getGroups: () => api.request('/groups/'),
+  getGroups: (cursor) =>
+    api.request(`/groups/?exclude_mine=true${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`),
+  getMyGroups: () => api.request('/groups/mine'),
   getGroup: (groupId) => api.request(`/groups/${groupId}`),
+  getGroupDashboard: (groupId) => api.request(`/groups/${groupId}/dashboard`),
   createGroup: (name, description) =>
     api.request('/groups/', { body: { name, description } }),
   joinGroup: (groupId) =>
@@ -80,6 +83,7 @@ const api = {
   // --- Challenges ---
   createChallenge: ({ Topic, difficulty, group_id }) =>
     api.request('/challenges/', { body: { Topic, difficulty, group_id } }),
+  getChallengeJob: (jobId) => api.request(`/challenges/jobs/${jobId}`),
 
   // CORRECT: This function properly calls your new endpoint.
   getChallengeHistory: (groupId) =>